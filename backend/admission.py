@@ -0,0 +1,46 @@
+import shutil
+import threading
+from pathlib import Path
+
+
+class ByteBudget:
+    """
+    Admits downloads against an in-flight byte budget and a free-disk floor.
+
+    Work is charged by its expected size on admission and credited back on
+    release, so a few large files cannot exhaust disk or bandwidth while many
+    small ones can still run side by side. When nothing is in flight, the next
+    item is always admitted so files larger than the budget still make progress.
+    """
+
+    def __init__(self, max_bytes: int, min_free: int, disk_path: Path):
+        self.max_bytes = max_bytes
+        self.min_free = min_free
+        self.disk_path = disk_path
+        self.in_flight = 0
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def try_acquire(self, size: int) -> bool:
+        """Charges size to the budget if it fits, returning whether it was admitted."""
+        with self.lock:
+            if self.count and not self._fits(size):
+                return False
+            self.in_flight += size
+            self.count += 1
+            return True
+
+    def release(self, size: int) -> None:
+        with self.lock:
+            self.in_flight -= size
+            self.count -= 1
+
+    def _fits(self, size: int) -> bool:
+        if self.in_flight + size > self.max_bytes:
+            return False
+        try:
+            free = shutil.disk_usage(self.disk_path).free
+        except OSError:
+            return True
+        # Bytes already admitted may not have been written yet
+        return free - self.in_flight - size >= self.min_free
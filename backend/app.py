@@ -16,6 +16,9 @@ app.config['SECRET_KEY'] = os.getenv('FLASK_SECRET_KEY', 'your-secret-key-change
 # Authentication Configuration
 USERS = os.getenv('USERS', "").split(',')
 
+# Send writes still queued from before a restart without waiting for a task
+service.start_outbox()
+
 
 
 # =============================================================================
@@ -43,6 +46,7 @@ def login():
             response = get('COUNT', bearer=password, table='CHECK', record='')
             if response.status_code == 200:
                 post('GENERIC', bearer=password, table='CHECK', data={"Title": f'{username} logged in at {datetime.utcnow().isoformat(sep=" ",timespec="seconds")}'})
+                service.start_outbox(password)
                 return jsonify({
                 'success': True,
                 'token': password,
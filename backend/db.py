@@ -1,63 +1,109 @@
 import os
+import gzip
+import json
 from dotenv import load_dotenv
+load_dotenv()
+import mirror
 from sessions import get_session
+from storage import Storage, LocalStorage
 from urllib.parse import quote
 
 session = get_session()
-load_dotenv()
+STORAGE = os.getenv('STORAGE', 'nocodb').lower()  # "nocodb" or "local" (embedded SQLite, see storage.LocalStorage)
+LOCAL_TABLES = "CHECK:CHECK,WW:WW,ZZ:ZZ,GI:GI,INI:INI,INIB:INIB,WWH:WWH"
+LOCAL_ENDPOINTS = "COUNT:COUNT,GENERIC:GENERIC,RECORDS:RECORDS,BULK:BULK"
 NOCO_DB_API_URL = os.getenv('NOCO_DB_API_URL', '')
 NOCO_DB_BASE = os.getenv('NOCO_DB_BASE', '')
-NOCO_DB_TABLES = dict(item.split(":") for item in os.getenv('NOCO_DB_TABLES', '').split(",")) or {}
-NOCO_DB_ENDPOINTS = dict(item.split(":") for item in os.getenv('NOCO_DB_ENDPOINTS', '').split(",")) or {}
+NOCO_DB_TABLES = dict(item.split(":") for item in os.getenv('NOCO_DB_TABLES', LOCAL_TABLES if STORAGE == 'local' else '').split(",") if item) or {}
+NOCO_DB_ENDPOINTS = dict(item.split(":") for item in os.getenv('NOCO_DB_ENDPOINTS', LOCAL_ENDPOINTS if STORAGE == 'local' else '').split(",") if item) or {}
+NOCO_DB_GZIP = os.getenv('NOCO_DB_GZIP', 'False').lower() == 'true'
+GZIP_MIN_BYTES = 1024
 HEADERS = {
     'Content-Type': 'application/json',
     'Authorization': "Bearer {}"
 }
 
-def get(ep, bearer=None, table="",record="",query_params=None):
-    """Generic GET request to NocoDB API"""
-    headers = HEADERS.copy()
-    if bearer:
-        headers['Authorization'] = headers['Authorization'].format(bearer)
-    endpoint = NOCO_DB_ENDPOINTS.get(ep,False)
-    # URL-encode the record parameter
-
-    encoded_record = quote(str(record), safe='') if record else record
-    url = NOCO_DB_API_URL.format(endpoint.format(NOCO_DB_BASE, NOCO_DB_TABLES[table], encoded_record)) if endpoint else ep
-    print(f"GET URL: {url} with params: {query_params}")
-    return session.get(
-        url,
-        headers=headers,
-        params=query_params
-    )
+def json_body(headers, data):
+    """Request arguments for a JSON body, gzip-compressed when NOCO_DB_GZIP is set and it is worth it"""
+    if not NOCO_DB_GZIP or data is None:
+        return {"json": data}
+    raw = json.dumps(data).encode('utf-8')
+    if len(raw) < GZIP_MIN_BYTES:
+        return {"json": data}
+    headers['Content-Encoding'] = 'gzip'
+    return {"data": gzip.compress(raw)}
+
+class NocoDBStorage(Storage):
+    """Storage on the NocoDB REST API configured by the NOCO_DB_* variables"""
+
+    def get(self, ep, bearer=None, table="",record="",query_params=None):
+        headers = HEADERS.copy()
+        if bearer:
+            headers['Authorization'] = headers['Authorization'].format(bearer)
+        endpoint = NOCO_DB_ENDPOINTS.get(ep,False)
+        # URL-encode the record parameter
+
+        encoded_record = quote(str(record), safe='') if record else record
+        url = NOCO_DB_API_URL.format(endpoint.format(NOCO_DB_BASE, NOCO_DB_TABLES[table], encoded_record)) if endpoint else ep
+        print(f"GET URL: {url} with params: {query_params}")
+        return session.get(
+            url,
+            headers=headers,
+            params=query_params
+        )
+
+    def patch(self, ep, bearer=None, table="",record="", data=None):
+        headers = HEADERS.copy()
+        if bearer:
+            headers['Authorization'] = headers['Authorization'].format(bearer)
+        endpoint = NOCO_DB_ENDPOINTS.get(ep,False)
+        # URL-encode the record parameter
+        encoded_record = quote(str(record), safe='') if record else record
+        url = NOCO_DB_API_URL.format(endpoint.format(NOCO_DB_BASE, NOCO_DB_TABLES[table], encoded_record)) if endpoint else ep
+        print(f"PATCH URL: {url} with data: {data}")
+        response = session.patch(
+            url,
+            headers=headers,
+            **json_body(headers, data)
+        )
+        if response.status_code == 200:
+            mirror.apply("patch", table, data)
+        return response
+
+    def post(self, endpoint, bearer=None, table="", data=None):
+        headers = HEADERS.copy()
+        if bearer:
+            headers['Authorization'] = headers['Authorization'].format(bearer)
+        endpoint = NOCO_DB_API_URL.format(NOCO_DB_ENDPOINTS.get(endpoint, endpoint))
+        url = endpoint.format(NOCO_DB_BASE, NOCO_DB_TABLES[table])
+        response = session.post(
+            url,
+            headers=headers,
+            **json_body(headers, data)
+        )
+        if response.status_code == 200:
+            mirror.apply("post", table, data)
+        return response
+
+if STORAGE == 'local':
+    BACKEND: Storage = LocalStorage()
+    # Reads are already local
+    mirror.MIRROR = False
+else:
+    BACKEND: Storage = NocoDBStorage()
+
+def get(ep, bearer=None, table="",record="",query_params=None,fields=None):
+    """Generic GET request to the storage backend; fields limits the returned columns (Id is always included)"""
+    if fields:
+        query_params = {**(query_params or {}), 'fields': ",".join(fields)}
+    return BACKEND.get(ep, bearer=bearer, table=table, record=record, query_params=query_params)
 
 def patch(ep, bearer=None, table="",record="", data=None):
-    """Generic PATCH request to NocoDB API"""
-    headers = HEADERS.copy()
-    if bearer:
-        headers['Authorization'] = headers['Authorization'].format(bearer)
-    endpoint = NOCO_DB_ENDPOINTS.get(ep,False)
-    # URL-encode the record parameter
-    encoded_record = quote(str(record), safe='') if record else record
-    url = NOCO_DB_API_URL.format(endpoint.format(NOCO_DB_BASE, NOCO_DB_TABLES[table], encoded_record)) if endpoint else ep
-    print(f"PATCH URL: {url} with data: {data}")
-    return session.patch(
-        url,
-        headers=headers,
-        json=data
-    )
+    """Generic PATCH request to the storage backend"""
+    return BACKEND.patch(ep, bearer=bearer, table=table, record=record, data=data)
 
 
 
 def post(endpoint, bearer=None, table="", data=None):
-    """Generic POST request to NocoDB API"""
-    headers = HEADERS.copy()
-    if bearer:
-        headers['Authorization'] = headers['Authorization'].format(bearer)
-    endpoint = NOCO_DB_API_URL.format(NOCO_DB_ENDPOINTS.get(endpoint, endpoint))
-    url = endpoint.format(NOCO_DB_BASE, NOCO_DB_TABLES[table])
-    return session.post(
-        url,
-        headers=headers,
-        json=data
-    )
\ No newline at end of file
+    """Generic POST request to the storage backend; data may be a list of records for bulk endpoints"""
+    return BACKEND.post(endpoint, bearer=bearer, table=table, data=data)
@@ -0,0 +1,79 @@
+import heapq
+import json
+import threading
+from itertools import groupby
+from pathlib import Path
+from typing import Callable, Iterator
+
+
+class SpillingGraph:
+    """
+    Accumulates {hash: data} records under a memory budget.
+
+    Records are merged in memory until their estimated size (their JSON
+    length) passes max_bytes; the graph is then written to spill_dir as a run
+    sorted by hash and memory is cleared. items() streams the final graph by
+    merging the runs and what is still in memory with heapq.merge, combining
+    the records of a hash with merge(existing, new), so only one record per
+    run is held at a time however large the corpus.
+    """
+
+    def __init__(self, merge: Callable[[dict, dict], dict], max_bytes: int, spill_dir: Path):
+        self.merge = merge
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.graph = {}
+        self.size = 0
+        self.runs = []
+        self.lock = threading.Lock()
+
+    def add(self, hashes: dict) -> None:
+        """Merges the records of one mod, spilling to disk when over budget."""
+        with self.lock:
+            for hash_key, hash_data in hashes.items():
+                self.graph[hash_key] = self.merge(self.graph.get(hash_key, {}), hash_data)
+                self.size += len(hash_key) + len(json.dumps(hash_data))
+            if self.size > self.max_bytes:
+                self._spill()
+
+    def items(self) -> Iterator[tuple]:
+        """Yields (hash, data) for every hash, sorted by hash."""
+        sources = [self._read_run(run) for run in self.runs]
+        sources.append(iter(sorted(self.graph.items())))
+        for hash_key, group in groupby(heapq.merge(*sources, key=lambda item: item[0]), key=lambda item: item[0]):
+            data = {}
+            for _, hash_data in group:
+                data = self.merge(data, hash_data)
+            yield hash_key, data
+
+    def close(self) -> None:
+        """Deletes the spilled runs."""
+        for run in self.runs:
+            run.unlink(missing_ok=True)
+        self.runs = []
+        self.graph = {}
+        self.size = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _spill(self) -> None:
+        self.spill_dir.mkdir(exist_ok=True, parents=True)
+        run = self.spill_dir / f"run_{id(self)}_{len(self.runs)}.jsonl"
+        with open(run, "w", encoding="utf-8") as f:
+            for hash_key in sorted(self.graph):
+                f.write(json.dumps([hash_key, self.graph[hash_key]]) + "\n")
+        self.runs.append(run)
+        self.graph = {}
+        self.size = 0
+
+    @staticmethod
+    def _read_run(run: Path) -> Iterator[tuple]:
+        with open(run, encoding="utf-8") as f:
+            for line in f:
+                hash_key, hash_data = json.loads(line)
+                yield hash_key, hash_data
@@ -0,0 +1,148 @@
+import json
+import os
+import time
+
+from sqlitedb import Database
+
+JOURNAL_PATH = os.getenv('JOURNAL_PATH', 'journal.db')
+
+database = Database(JOURNAL_PATH, [
+    """
+    CREATE TABLE IF NOT EXISTS files (
+        task TEXT NOT NULL,
+        game TEXT NOT NULL,
+        mod_id TEXT NOT NULL,
+        file_id TEXT NOT NULL,
+        data TEXT NOT NULL,
+        updated REAL NOT NULL,
+        PRIMARY KEY (task, game, file_id)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS files_mod ON files (task, game, mod_id)",
+    """
+    CREATE TABLE IF NOT EXISTS blobs (
+        hash TEXT PRIMARY KEY,
+        updated REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS inis (
+        ini_id TEXT PRIMARY KEY,
+        updated REAL NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS mapped (
+        game TEXT NOT NULL,
+        mod_id TEXT NOT NULL,
+        fingerprint TEXT,
+        hashes TEXT,
+        pending_fingerprint TEXT,
+        pending_hashes TEXT,
+        updated REAL NOT NULL,
+        PRIMARY KEY (game, mod_id)
+    )
+    """,
+])
+
+
+def execute(sql: str, params=()) -> list:
+    """Runs a statement and commits it, so every recorded outcome survives a crash."""
+    return database.execute(sql, params)
+
+
+def record_file(task: str, game: str, mod_id: str, file_id, data: dict) -> None:
+    """Records the final outcome of a file processed by a task."""
+    execute(
+        "INSERT OR REPLACE INTO files (task, game, mod_id, file_id, data, updated) VALUES (?, ?, ?, ?, ?, ?)",
+        (task, game, str(mod_id), str(file_id), json.dumps(data), time.time())
+    )
+
+
+def finished_files(task: str, game: str, mod_id: str) -> dict:
+    """Returns {file id: data} for the files of a mod a task has already finished."""
+    rows = execute(
+        "SELECT file_id, data FROM files WHERE task = ? AND game = ? AND mod_id = ?",
+        (task, game, str(mod_id))
+    )
+    return {file_id: json.loads(data) for file_id, data in rows}
+
+
+def record_ini(ini_id: str) -> None:
+    """Records that an INI record has been handed to the database."""
+    execute("INSERT OR REPLACE INTO inis (ini_id, updated) VALUES (?, ?)", (ini_id, time.time()))
+
+
+def is_ini_recorded(ini_id: str) -> bool:
+    return bool(execute("SELECT 1 FROM inis WHERE ini_id = ?", (ini_id,)))
+
+
+def claim_blob(content_hash: str) -> bool:
+    """Claims the upload of an INI blob, returning False if it was already claimed (see release_blob)."""
+    with database.transaction() as connection:
+        return connection.execute(
+            "INSERT OR IGNORE INTO blobs (hash, updated) VALUES (?, ?)", (content_hash, time.time())
+        ).rowcount == 1
+
+
+def release_blob(content_hash: str) -> None:
+    """Forgets a blob claim whose upload failed, so the next INI with that content uploads it again."""
+    execute("DELETE FROM blobs WHERE hash = ?", (content_hash,))
+
+
+def finish_mod(task: str, game: str, mod_id: str) -> None:
+    """Forgets a mod's file and INI entries once its record has been written."""
+    execute("DELETE FROM files WHERE task = ? AND game = ? AND mod_id = ?", (task, game, str(mod_id)))
+    prefix = f"{game}/{mod_id}/"
+    execute("DELETE FROM inis WHERE substr(ini_id, 1, ?) = ?", (len(prefix), prefix))
+
+
+def mapped_fingerprint(game: str, mod_id: str):
+    """Returns the fingerprint of a mod's inputs when it was last mapped, or None."""
+    rows = execute("SELECT fingerprint FROM mapped WHERE game = ? AND mod_id = ?", (game, str(mod_id)))
+    return rows[0][0] if rows else None
+
+
+def mapped_hashes(game: str, mod_id: str) -> dict:
+    """Returns the hash data a mod contributed when it was last mapped."""
+    rows = execute("SELECT hashes FROM mapped WHERE game = ? AND mod_id = ?", (game, str(mod_id)))
+    return json.loads(rows[0][0]) if rows and rows[0][0] else {}
+
+
+def mapped_mods(game: str) -> set:
+    return {mod_id for (mod_id,) in execute("SELECT mod_id FROM mapped WHERE game = ? AND fingerprint IS NOT NULL", (game,))}
+
+
+def stage_mapped(game: str, mod_id: str, fingerprint: str, hashes: dict) -> None:
+    """
+    Records a mod's new mapping contribution, to take effect on commit_mapped.
+
+    An empty fingerprint stages the mod's removal.
+    """
+    execute(
+        "INSERT INTO mapped (game, mod_id, pending_fingerprint, pending_hashes, updated) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (game, mod_id) DO UPDATE SET pending_fingerprint = excluded.pending_fingerprint, "
+        "pending_hashes = excluded.pending_hashes, updated = excluded.updated",
+        (game, str(mod_id), fingerprint, json.dumps(hashes), time.time())
+    )
+
+
+def commit_mapped(game: str) -> None:
+    """Makes the staged contributions current once they have been written to the database."""
+    execute("DELETE FROM mapped WHERE game = ? AND pending_fingerprint = ''", (game,))
+    execute(
+        "UPDATE mapped SET fingerprint = pending_fingerprint, hashes = pending_hashes, "
+        "pending_fingerprint = NULL, pending_hashes = NULL WHERE game = ? AND pending_fingerprint IS NOT NULL",
+        (game,)
+    )
+
+
+def reset_mapped(game: str) -> None:
+    """Forgets every mapped contribution of a game, so the next map rebuilds its hash records."""
+    execute("DELETE FROM mapped WHERE game = ?", (game,))
+
+
+def discard_mapped(game: str) -> None:
+    """Forgets staged contributions of a map run that did not save them."""
+    execute("DELETE FROM mapped WHERE game = ? AND fingerprint IS NULL", (game,))
+    execute("UPDATE mapped SET pending_fingerprint = NULL, pending_hashes = NULL WHERE game = ?", (game,))
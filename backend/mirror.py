@@ -0,0 +1,203 @@
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from sqlitedb import Database
+
+MIRROR = os.getenv('MIRROR', 'False').lower() == 'true'  # Serve NocoDB reads from a local copy
+MIRROR_PATH = os.getenv('MIRROR_PATH', 'mirror.db')
+MIRROR_TABLES = set(filter(None, os.getenv('MIRROR_TABLES', 'WW,ZZ,GI,INI,INIB,WWH').split(',')))  # NOCO_DB_TABLES keys
+SYNC_INTERVAL = float(os.getenv('MIRROR_SYNC_INTERVAL', 300))  # Seconds a synced table is served without asking NocoDB
+SYNC_OVERLAP = 120  # Seconds re-read before the watermark, covering clock skew with NocoDB
+UPDATED_FIELD = os.getenv('MIRROR_UPDATED_FIELD', 'UpdatedAt')
+KEY_FIELDS = {"WWH": "Hash", "INIB": "Hash"}  # Primary key field of tables not keyed by Id
+READ_BATCH = 500
+
+database = Database(MIRROR_PATH, [
+    """
+    CREATE TABLE IF NOT EXISTS records (
+        tbl TEXT NOT NULL,
+        id TEXT NOT NULL,
+        fields TEXT NOT NULL,
+        PRIMARY KEY (tbl, id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS syncs (
+        tbl TEXT PRIMARY KEY,
+        watermark REAL NOT NULL,
+        synced REAL NOT NULL
+    )
+    """,
+])
+sync_lock = threading.Lock()
+
+CONDITION = re.compile(r"\s*\(\s*([^,()]+?)\s*,\s*(eq|neq|like|nlike)\s*,\s*([^()]*?)\s*\)\s*")
+JOIN = re.compile(r"~(and|or)")
+
+
+def enabled(table: str) -> bool:
+    return MIRROR and table in MIRROR_TABLES
+
+
+def execute(sql: str, params=()) -> list:
+    return database.execute(sql, params)
+
+
+def executemany(sql: str, rows: list) -> None:
+    database.executemany(sql, rows)
+
+
+def sync(table: str, fetch_pages: Callable, force: bool = False) -> None:
+    """
+    Brings the local copy of a table up to date with NocoDB.
+
+    The first sync copies the whole table; later ones only ask for records
+    whose UPDATED_FIELD is past the previous sync's start time (less
+    SYNC_OVERLAP). Rows deleted remotely are not noticed, a forced sync of a
+    cleared table recopies it.
+
+    Args:
+        table: NOCO_DB_TABLES key
+        fetch_pages: Called with a where clause (or None for everything), returns
+            an iterable of record pages as listed by service.iter_recr; it must
+            raise rather than stop early on errors
+        force: Sync even if the table was synced less than SYNC_INTERVAL ago
+    """
+    with sync_lock:
+        state = execute("SELECT watermark, synced FROM syncs WHERE tbl = ?", (table,))
+        if state and not force and time.time() - state[0][1] < SYNC_INTERVAL:
+            return
+        started = time.time()
+        where = None
+        if state:
+            since = datetime.fromtimestamp(state[0][0] - SYNC_OVERLAP, timezone.utc)
+            where = f"({UPDATED_FIELD},gt,exactDate,{since.strftime('%Y-%m-%d %H:%M:%S')})"
+        for records in fetch_pages(where):
+            store(table, records)
+        execute("INSERT OR REPLACE INTO syncs (tbl, watermark, synced) VALUES (?, ?, ?)", (table, started, time.time()))
+
+
+def is_synced(table: str) -> bool:
+    return bool(execute("SELECT 1 FROM syncs WHERE tbl = ?", (table,)))
+
+
+def store(table: str, records: list) -> None:
+    """Replaces local records with records listed from NocoDB ({"Id", **fields})."""
+    # Updated in place: INSERT OR REPLACE would give the row a new rowid and
+    # move it behind the cursor of a running iter_records
+    executemany(
+        "INSERT INTO records (tbl, id, fields) VALUES (?, ?, ?) "
+        "ON CONFLICT (tbl, id) DO UPDATE SET fields = excluded.fields",
+        [(table, str(record["Id"]), json.dumps(record)) for record in records]
+    )
+
+
+def apply(method: str, table: str, data) -> None:
+    """
+    Writes a successful NocoDB post or patch through to the local copy.
+
+    Only tables that have been synced are kept; inserts that leave the key to
+    NocoDB are skipped and arrive with the next sync.
+    """
+    if not enabled(table) or not is_synced(table):
+        return
+    key_field = KEY_FIELDS.get(table, "Id")
+    for item in data if isinstance(data, list) else [data]:
+        if method == "patch":
+            record_id, fields = item.get("id"), item.get("fields", {})
+        else:
+            fields = item.get("fields", item)
+            record_id = fields.get(key_field)
+        if record_id is None:
+            continue
+        fields = text_fields(fields)
+        existing = get_record(table, record_id) if method == "patch" else None
+        if method == "patch" and existing is None:
+            continue
+        store(table, [{**(existing or {}), **fields, "Id": record_id}])
+
+
+def text_fields(fields: dict) -> dict:
+    """Returns fields with JSON values serialised, the way NocoDB hands them back."""
+    return {name: value if value is None or isinstance(value, (str, int, float)) else json.dumps(value)
+            for name, value in fields.items()}
+
+
+def get_record(table: str, record_id) -> Optional[dict]:
+    """Returns the fields of a local record (including Id), or None if it is not mirrored."""
+    rows = execute("SELECT fields FROM records WHERE tbl = ? AND id = ?", (table, str(record_id)))
+    return json.loads(rows[0][0]) if rows else None
+
+
+def iter_records(table: str, where: Optional[str] = None, fields: Optional[list] = None):
+    """
+    Returns a generator over local records matching a NocoDB where clause.
+
+    Only eq/neq/like/nlike conditions joined by a single kind of ~and/~or are
+    understood; anything else raises ValueError (before any record is read) so
+    callers can ask NocoDB instead.
+    """
+    condition, params = where_sql(table, where)
+    return _iter_rows(table, condition, params, fields)
+
+
+def _iter_rows(table: str, condition: str, params: list, fields: Optional[list]):
+    last = -1
+    while True:
+        rows = execute(
+            f"SELECT rowid, fields FROM records WHERE tbl = ? AND rowid > ? AND ({condition}) ORDER BY rowid LIMIT ?",
+            (table, last, *params, READ_BATCH)
+        )
+        for rowid, record in rows:
+            record = json.loads(record)
+            if fields:
+                record = {name: value for name, value in record.items() if name == "Id" or name in fields}
+            yield record
+        if len(rows) < READ_BATCH:
+            return
+        last = rows[-1][0]
+
+
+def where_sql(table: str, where: Optional[str]) -> tuple:
+    """Translates a NocoDB where clause into an SQL condition and its parameters."""
+    if not where:
+        return "1", []
+    conditions, params, joins = [], [], set()
+    position = 0
+    while True:
+        match = CONDITION.match(where, position)
+        if not match:
+            raise ValueError(f"Unsupported where clause: {where}")
+        field, op, value = match.groups()
+        if field in ("Id", KEY_FIELDS.get(table, "Id")):
+            column = "id"
+        else:
+            column = f"CAST(json_extract(fields, '$.\"{field}\"') AS TEXT)"
+        if op in ("like", "nlike"):
+            # NocoDB matches like patterns without wildcards anywhere in the value
+            value = value if "%" in value else f"%{value}%"
+        prefix = value[:-1]
+        if column == "id" and op == "like" and value.endswith("%") and prefix and not set(prefix) & {"%", "_"}:
+            # A key prefix is read as a range of the primary key index rather
+            # than a LIKE, which SQLite can only answer by scanning the table
+            conditions.append("(id >= ? AND id < ?)")
+            params += [prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)]
+        else:
+            conditions.append(f"{column} {({'eq': '=', 'neq': '!=', 'like': 'LIKE', 'nlike': 'NOT LIKE'})[op]} ?")
+            params.append(value)
+        position = match.end()
+        if position == len(where):
+            break
+        join = JOIN.match(where, position)
+        if not join:
+            raise ValueError(f"Unsupported where clause: {where}")
+        joins.add(join.group(1))
+        position = join.end()
+    if len(joins) > 1:
+        raise ValueError(f"Mixed ~and/~or where clause: {where}")
+    return f" {(joins or {'and'}).pop().upper()} ".join(conditions), params
@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+import time
+from typing import Callable
+
+import db
+from sqlitedb import Database
+
+OUTBOX_PATH = os.getenv('OUTBOX_PATH', 'outbox.db')
+BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 50))  # Writes taken from the queue per drain cycle
+BATCH_BYTES = int(os.getenv('OUTBOX_BATCH_BYTES', 1024 * 1024))  # Payload cap for one bulk request
+FLUSH_INTERVAL = float(os.getenv('OUTBOX_FLUSH_INTERVAL', 2))  # Seconds a partial batch may wait for more writes
+BULK_ENDPOINT = "BULK"  # NOCO_DB_ENDPOINTS key for multi-record inserts
+DRAIN_INTERVAL = 1  # Seconds between drain cycles when nothing new is queued
+MAX_ATTEMPTS = 8
+MAX_BACKOFF = 300
+
+database = Database(OUTBOX_PATH, [
+    """
+    CREATE TABLE IF NOT EXISTS writes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        method TEXT NOT NULL,
+        endpoint TEXT NOT NULL,
+        tbl TEXT NOT NULL,
+        record TEXT,
+        data TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        next_attempt REAL NOT NULL DEFAULT 0,
+        status TEXT NOT NULL DEFAULT 'pending',
+        error TEXT,
+        created REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS writes_record ON writes (tbl, record)",
+])
+wake = threading.Event()
+drainer = None
+get_bearer: Callable[[], str] = lambda: ""
+failure_handlers: dict = {}  # table -> called with the record of each write given up on
+log: Callable = lambda message, level="info": print(f"[{level.upper()}] {message}")
+
+
+def execute(sql: str, params=()) -> list:
+    return database.execute(sql, params)
+
+
+def start(bearer_provider: Callable[[], str], logger: Callable = None) -> None:
+    """Starts the background drain thread (once) using the given bearer and logger."""
+    global drainer, get_bearer, log
+    get_bearer = bearer_provider
+    if logger:
+        log = logger
+    if drainer is None or not drainer.is_alive():
+        drainer = threading.Thread(target=drain_forever, name="outbox", daemon=True)
+        drainer.start()
+    wake.set()
+
+
+def on_failure(table: str, handler: Callable[[str], None]) -> None:
+    """Registers a handler called with the record of every write to table that is given up on."""
+    failure_handlers[table] = handler
+
+
+def enqueue(method: str, endpoint: str, table: str, data, record: str = None) -> None:
+    """
+    Durably queues a NocoDB write to be sent in the background.
+
+    Args:
+        method: "post" or "patch"
+        endpoint: NOCO_DB_ENDPOINTS key, as passed to db.post/db.patch
+        table: NOCO_DB_TABLES key
+        data: JSON payload; patches are lists of {"id", "fields"} records
+        record: Id of the record being written, so callers can see it is pending
+    """
+    execute(
+        "INSERT INTO writes (method, endpoint, tbl, record, data, created) VALUES (?, ?, ?, ?, ?, ?)",
+        (method, endpoint, table, record, json.dumps(data), time.time())
+    )
+    wake.set()
+
+
+def is_pending(table: str, record: str) -> bool:
+    """Whether a write for a record is still queued."""
+    return bool(execute("SELECT 1 FROM writes WHERE tbl = ? AND record = ? AND status = 'pending' LIMIT 1", (table, str(record))))
+
+
+def stats() -> dict:
+    rows = execute("SELECT status, COUNT(*), MIN(created) FROM writes GROUP BY status")
+    counts = {status: (count, oldest) for status, count, oldest in rows}
+    pending, oldest = counts.get('pending', (0, None))
+    return {
+        "pending": pending,
+        "failed": counts.get('failed', (0, None))[0],
+        "oldest_pending_age": round(time.time() - oldest) if oldest else 0,
+    }
+
+
+def drain_forever() -> None:
+    while True:
+        wake.wait(DRAIN_INTERVAL)
+        wake.clear()
+        try:
+            while get_bearer() and drain_once():
+                pass
+        except Exception as e:
+            log(f"Unexpected error draining outbox: {e}", level="error")
+
+
+def drain_once() -> int:
+    """
+    Sends one batch of due writes, returning how many were taken from the queue.
+    
+    A partial batch is held back until its oldest write has waited
+    FLUSH_INTERVAL seconds, so bursts of small writes share requests.
+    """
+    now = time.time()
+    rows = execute(
+        "SELECT id, method, endpoint, tbl, data, attempts, record, created FROM writes "
+        "WHERE status = 'pending' AND next_attempt <= ? ORDER BY id LIMIT ?",
+        (now, BATCH_SIZE)
+    )
+    if not rows or (len(rows) < BATCH_SIZE and rows[0][7] > now - FLUSH_INTERVAL):
+        return 0
+    # Writes of a batch to the same table go out as one request: patches as a
+    # list of records (as long as no record appears twice), posts through the
+    # bulk endpoint when it is configured. A write only joins an earlier group
+    # when no group started since then touches the same record, so writes to
+    # one record are still sent in the order they were queued
+    bulk = BULK_ENDPOINT in db.NOCO_DB_ENDPOINTS
+    groups = []
+    open_groups = {}  # (method, endpoint, table) -> index in groups of the group writes can join
+    for row in rows:
+        write_id, method, endpoint, table, data, attempts, record, created = row
+        ids = {item.get("id") for item in json.loads(data)} if method == "patch" else set()
+        touched = {(table, str(key)) for key in ids | {record} if key is not None}
+        index = open_groups.get((method, endpoint, table))
+        previous = groups[index] if index is not None else None
+        if (previous and (method == "patch" or bulk) and not ids & previous["ids"]
+                and previous["size"] + len(data) <= BATCH_BYTES
+                and not any(touched & group["records"] for group in groups[index + 1:])):
+            previous["rows"].append(row)
+            previous["ids"] |= ids
+            previous["records"] |= touched
+            previous["size"] += len(data)
+        else:
+            open_groups[(method, endpoint, table)] = len(groups)
+            groups.append({"method": method, "key": (endpoint, table), "rows": [row], "ids": ids, "records": touched, "size": len(data)})
+    for group in groups:
+        send(group)
+    return len(rows)
+
+
+def send(group: dict) -> None:
+    endpoint, table = group["key"]
+    payloads = [json.loads(row[4]) for row in group["rows"]]
+    try:
+        if group["method"] == "patch":
+            res = db.patch(endpoint, bearer=get_bearer(), table=table, data=[item for payload in payloads for item in payload])
+        elif len(payloads) > 1:
+            res = db.post(BULK_ENDPOINT, bearer=get_bearer(), table=table, data=payloads)
+        else:
+            res = db.post(endpoint, bearer=get_bearer(), table=table, data=payloads[0])
+        status, error = res.status_code, f"{res.status_code} - {res.text[:500]}"
+    except Exception as e:
+        status, error = None, str(e)
+    ids = [row[0] for row in group["rows"]]
+    if status == 200:
+        execute(f"DELETE FROM writes WHERE id IN ({','.join('?' * len(ids))})", ids)
+        return
+    if len(group["rows"]) > 1:
+        # Find out which writes of the batch are at fault by sending them one by one
+        for row in group["rows"]:
+            send({"method": group["method"], "key": group["key"], "rows": [row]})
+        return
+    for write_id, _, _, _, _, attempts, record, _ in group["rows"]:
+        # Client errors other than throttling will not succeed on retry
+        permanent = status is not None and 400 <= status < 500 and status != 429
+        if permanent or attempts + 1 >= MAX_ATTEMPTS:
+            log(f"Giving up on queued {group['method']} of {record} to {table} after {attempts + 1} attempt(s): {error}", level="error")
+            execute("UPDATE writes SET status = 'failed', attempts = ?, error = ? WHERE id = ?", (attempts + 1, error, write_id))
+            handler = failure_handlers.get(table)
+            if handler and record is not None:
+                try:
+                    handler(record)
+                except Exception as e:
+                    log(f"Error handling failed write of {record} to {table}: {e}", level="error")
+        else:
+            delay = min(MAX_BACKOFF, 2 ** attempts)
+            log(f"Queued {group['method']} of {record} to {table} failed, retrying in {delay}s: {error}", level="warn")
+            execute(
+                "UPDATE writes SET attempts = ?, next_attempt = ?, error = ? WHERE id = ?",
+                (attempts + 1, time.time() + delay, error, write_id)
+            )
@@ -1,6 +1,7 @@
 from ini_parser import parse_ini_by_hash, print_parsed_ini
 import json
 import db
+import mirror
 data=""
 path=""
 file="temp_A.ini"
@@ -12,14 +13,26 @@ bearer = "" #Your bearer token here
 
 updated_data={}
 
+def get_hash_record(hash):
+    """Fields of a WWH record, from the local mirror the service keeps when it has it"""
+    if mirror.enabled("WWH"):
+        fields = mirror.get_record("WWH", hash)
+        if fields is not None:
+            return fields
+    res = db.get('RECORDS', bearer=bearer, table="WWH", record=hash)
+    if res.status_code == 200:
+        return res.json().get('fields', {})
+    return None
+
 def patch_hash(hash,prev=[]):
     if hash in prev:
         return hash
-    res = db.get('RECORDS', bearer=bearer, table="WWH", record=hash)
-    if res.status_code == 200:
-        hash_record = res.json()
-        fields = hash_record.get('fields', {})
+    fields = get_hash_record(hash)
+    if fields is not None:
         next=json.loads(fields.get('Data', '{}'))
+        # Hashes whose every mapping was retracted by an incremental map are left empty
+        if not next:
+            return hash
         next_keys = list(next.keys())
         next_keys.sort(key=lambda x: float(x))    
         max_ver = next_keys[-1]
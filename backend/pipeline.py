@@ -0,0 +1,80 @@
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable
+
+STOP = object()
+
+
+class Pipeline:
+    """
+    Runs items through a fixed sequence of stages, each served by its own
+    worker threads and connected to the next by a bounded queue.
+
+    Stages are (name, function, workers) tuples; each function takes the item
+    and returns it for the next stage. Sizing the stages independently lets a
+    network-bound stage and a CPU-bound stage saturate their own resources
+    without one blocking the other's slots.
+
+    finalize(item, error) runs once per item after the last stage, or after the
+    stage that raised (remaining stages are skipped), and its return value
+    resolves the future returned by submit.
+    """
+
+    def __init__(self, stages: list, queue_size: int, finalize: Callable):
+        self.stages = stages
+        self.finalize = finalize
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self.threads = []
+        for index, (name, fn, workers) in enumerate(stages):
+            group = [
+                threading.Thread(target=self._work, args=(index, fn), name=f"{name}-{n}", daemon=True)
+                for n in range(workers)
+            ]
+            for thread in group:
+                thread.start()
+            self.threads.append(group)
+
+    def submit(self, item) -> Future:
+        """Queues an item for the first stage, blocking while that queue is full."""
+        future = Future()
+        future.set_running_or_notify_cancel()
+        self.queues[0].put((item, future))
+        return future
+
+    def shutdown(self) -> None:
+        """Lets queued items drain through every stage, then stops the workers."""
+        for index, group in enumerate(self.threads):
+            for _ in group:
+                self.queues[index].put(STOP)
+            for thread in group:
+                thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        return False
+
+    def _work(self, index: int, fn: Callable) -> None:
+        while True:
+            job = self.queues[index].get()
+            if job is STOP:
+                return
+            item, future = job
+            try:
+                item = fn(item)
+            except Exception as e:
+                self._resolve(item, future, e)
+                continue
+            if index + 1 < len(self.queues):
+                self.queues[index + 1].put((item, future))
+            else:
+                self._resolve(item, future, None)
+
+    def _resolve(self, item, future: Future, error) -> None:
+        try:
+            future.set_result(self.finalize(item, error))
+        except Exception as e:
+            future.set_exception(e)
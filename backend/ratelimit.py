@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlparse
+
+BACKOFF_STATUSES = [429, 500, 502, 503, 504]
+MAX_RETRY_AFTER = 300  # Never pause a host for longer than this, whatever Retry-After says
+
+# Starting point and ceiling for each remote; rates are requests per second
+BUDGETS = {
+    "gamebanana_api": {"rate": 2.0, "max_rate": 20.0, "concurrency": 4, "max_concurrency": 16},
+    "gamebanana_dl": {"rate": 2.0, "max_rate": 10.0, "concurrency": 4, "max_concurrency": 16},
+    "nocodb": {"rate": 5.0, "max_rate": 50.0, "concurrency": 4, "max_concurrency": 32},
+}
+MIN_RATE = 0.2
+RATE_STEP = 0.2  # Additive increase per healthy response
+
+
+class HostBudget:
+    """
+    Token bucket and concurrency window for one remote, adjusted AIMD-style.
+
+    Every healthy response grows the request rate additively and the concurrency
+    window by one slot per window of successes; a 429/5xx halves both and pauses
+    the remote for Retry-After seconds (or the configured cooldown).
+    """
+
+    def __init__(self, name: str, rate: float, max_rate: float, concurrency: int, max_concurrency: int, cooldown: float = 2):
+        self.name = name
+        self.rate = rate
+        self.max_rate = max_rate
+        self.concurrency = float(concurrency)
+        self.max_concurrency = max_concurrency
+        self.cooldown = cooldown
+        self.tokens = 1.0
+        self.updated = time.monotonic()
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.throttled = 0
+        self.cond = threading.Condition()
+
+    def acquire(self) -> None:
+        """Blocks until the remote may receive another request."""
+        with self.cond:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    self.cond.wait(self.blocked_until - now)
+                elif self.in_flight >= int(self.concurrency):
+                    self.cond.wait()
+                elif self.tokens < 1:
+                    self.cond.wait((1 - self.tokens) / self.rate)
+                else:
+                    self.tokens -= 1
+                    self.in_flight += 1
+                    return
+
+    def release(self, status: Optional[int], retry_after: Optional[float] = None) -> None:
+        """Returns a concurrency slot and adapts the budget to the response status."""
+        with self.cond:
+            self.in_flight -= 1
+            if status in BACKOFF_STATUSES:
+                self.throttled += 1
+                self.rate = max(MIN_RATE, self.rate / 2)
+                self.concurrency = max(1.0, self.concurrency / 2)
+                pause = retry_after if retry_after is not None else self.cooldown
+                self.blocked_until = max(self.blocked_until, time.monotonic() + pause)
+            elif status is not None:
+                self.rate = min(self.max_rate, self.rate + RATE_STEP)
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1 / self.concurrency)
+            self.cond.notify_all()
+
+    def snapshot(self) -> dict:
+        return {
+            "rate": round(self.rate, 2),
+            "concurrency": int(self.concurrency),
+            "in_flight": self.in_flight,
+            "throttled": self.throttled,
+            "paused_for": round(max(0.0, self.blocked_until - time.monotonic()), 1),
+        }
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(max(1.0, self.rate), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+budgets = {}
+budgets_lock = threading.RLock()
+
+
+def reset(cooldown: float = 2, concurrency: Optional[dict] = None) -> None:
+    """
+    Restores every budget to its starting point; cooldown applies to 429/5xx
+    without Retry-After and concurrency overrides the starting window of the
+    named budgets (capped at their max_concurrency).
+    """
+    with budgets_lock:
+        budgets.clear()
+        for name, settings in BUDGETS.items():
+            settings = dict(settings)
+            if concurrency and name in concurrency:
+                settings["concurrency"] = max(1, min(settings["max_concurrency"], concurrency[name]))
+            budgets[name] = HostBudget(name, cooldown=cooldown, **settings)
+
+
+def max_concurrency(name: str) -> int:
+    """Largest window a budget can grow to, so worker pools can be sized for it."""
+    return BUDGETS[name]["max_concurrency"]
+
+
+def budget_for(url: str) -> Optional[HostBudget]:
+    """Returns the budget governing a URL, or None for remotes that are not rate limited."""
+    parsed = urlparse(url)
+    host = parsed.hostname or ""
+    if host == "gamebanana.com" and parsed.path.startswith("/apiv11"):
+        name = "gamebanana_api"
+    elif host == "gamebanana.com" or host.endswith(".gamebanana.com"):
+        name = "gamebanana_dl"
+    elif host and host == urlparse(os.getenv('NOCO_DB_API_URL', '')).hostname:
+        name = "nocodb"
+    else:
+        return None
+    with budgets_lock:
+        if not budgets:
+            reset()
+        return budgets[name]
+
+
+def snapshot() -> dict:
+    with budgets_lock:
+        return {name: budget.snapshot() for name, budget in budgets.items()}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parses a Retry-After header given either as seconds or as an HTTP date."""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            seconds = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(MAX_RETRY_AFTER, max(0.0, seconds))
@@ -0,0 +1,148 @@
+import io
+import re
+from typing import Optional
+
+READ_AHEAD = 64 * 1024  # Minimum bytes fetched per uncached read
+TAIL_SIZE = 64 * 1024 + 22  # End of central directory record plus the largest possible comment
+MAX_SPANS = 32  # Cached byte ranges kept per file
+COALESCE_GAP = 64 * 1024  # Adjacent member ranges closer than this are fetched in one request
+LOCAL_HEADER_SLACK = 1024  # Allowance for local extra fields that differ from the central directory
+
+CONTENT_RANGE_PATTERN = re.compile(r'^bytes\s+(\d+)-(\d+)/(\d+)$')
+
+
+class HttpRangeFile(io.RawIOBase):
+    """
+    Read-only, seekable file object backed by HTTP Range requests.
+
+    Lets zipfile read the central directory and selected members of a remote
+    archive without downloading the rest of it. Fetched ranges are cached so the
+    many small reads zipfile makes are served from a handful of requests.
+    """
+
+    def __init__(self, session, url: str, size: int, timeout: int = 30):
+        super().__init__()
+        self.session = session
+        self.url = url
+        self.size = size
+        self.timeout = timeout
+        self.pos = 0
+        self.spans = []  # [(start, bytes)] most recently used last
+        self.bytes_fetched = 0
+        self.requests = 0
+
+    @classmethod
+    def open(cls, session, url: str, timeout: int = 30) -> Optional["HttpRangeFile"]:
+        """
+        Probes a URL for Range support and returns a file over it.
+
+        Returns:
+            HttpRangeFile positioned at 0, or None if the server did not answer
+            the probe with 206 Partial Content
+        """
+        response = session.get(
+            url,
+            headers={'Range': f'bytes=-{TAIL_SIZE}', 'Accept-Encoding': 'identity'},
+            stream=True,
+            timeout=timeout
+        )
+        try:
+            if response.status_code != 206:
+                return None
+            match = CONTENT_RANGE_PATTERN.match(response.headers.get('Content-Range', ''))
+            if not match:
+                return None
+            start, size = int(match.group(1)), int(match.group(3))
+            # Keep the redirect target so later ranges skip the redirect hop
+            remote = cls(session, response.url, size, timeout)
+            tail = response.content
+            remote._store(start, tail)
+            remote.bytes_fetched += len(tail)
+            remote.requests += 1
+            return remote
+        finally:
+            response.close()
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self.pos = offset
+        elif whence == io.SEEK_CUR:
+            self.pos += offset
+        elif whence == io.SEEK_END:
+            self.pos = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if self.pos < 0:
+            raise ValueError("Negative seek position")
+        return self.pos
+
+    def readinto(self, buffer) -> int:
+        want = min(len(buffer), self.size - self.pos)
+        filled = 0
+        while filled < want:
+            data = self._cached(self.pos, want - filled)
+            if data is None:
+                self._fetch(self.pos, min(self.size, self.pos + max(want - filled, READ_AHEAD)))
+                continue
+            buffer[filled:filled + len(data)] = data
+            filled += len(data)
+            self.pos += len(data)
+        return max(filled, 0)
+
+    def prefetch(self, ranges: list) -> None:
+        """Fetches the given (start, end) byte ranges, merging ones that are close together."""
+        merged = []
+        for start, end in sorted(ranges):
+            end = min(end, self.size)
+            if merged and start - merged[-1][1] <= COALESCE_GAP:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        for start, end in merged:
+            if self._cached(start, end - start) is None:
+                self._fetch(start, end)
+
+    def prefetch_members(self, infos: list) -> None:
+        """Fetches the local headers and compressed data of the given ZipInfo members."""
+        self.prefetch([
+            (
+                info.header_offset,
+                info.header_offset + 30 + len(info.orig_filename.encode('utf-8')) + len(info.extra)
+                + info.compress_size + LOCAL_HEADER_SLACK
+            )
+            for info in infos
+        ])
+
+    def _cached(self, start: int, length: int) -> Optional[bytes]:
+        for i, (span_start, data) in enumerate(self.spans):
+            if span_start <= start and start < span_start + len(data):
+                offset = start - span_start
+                self.spans.append(self.spans.pop(i))
+                return data[offset:offset + length]
+        return None
+
+    def _fetch(self, start: int, end: int) -> None:
+        response = self.session.get(
+            self.url,
+            headers={'Range': f'bytes={start}-{end - 1}', 'Accept-Encoding': 'identity'},
+            timeout=self.timeout
+        )
+        if response.status_code != 206:
+            raise IOError(f"Range request for bytes {start}-{end - 1} returned {response.status_code}")
+        self.bytes_fetched += len(response.content)
+        self.requests += 1
+        self._store(start, response.content)
+
+    def _store(self, start: int, data: bytes) -> None:
+        self.spans.append((start, data))
+        if len(self.spans) > MAX_SPANS:
+            self.spans.pop(0)
@@ -2,17 +2,34 @@ from flask import json
 import requests
 import os
 import shutil
-from pathlib import Path
+import tempfile
+import zipfile
+from pathlib import Path, PurePosixPath
 from datetime import datetime
 import time
 from typing import TypedDict, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
 import threading
+import queue
+import hashlib
+import zlib
+import base64
+from collections import OrderedDict, deque
+from bisect import bisect_right
 import db
+import ratelimit
+import journal
+import outbox
+import mirror
+from admission import ByteBudget
+from pipeline import Pipeline
+from hashgraph import SpillingGraph
 from sessions import get_session
+from remote_zip import HttpRangeFile
 from ini_parser import parse_ini_by_hash, print_parsed_ini
 session = get_session()
-good=[]
 logs=[]
 new_logs=[]
 def log(message: str, level: str = "info") -> None:
@@ -89,14 +106,40 @@ VERSIONS=[1.1,1.2,1.3,1.4,2.0,2.1,2.2,2.3,2.4,2.5,2.6,2.7]
 VERSION_TIME=[1719532800, 1723680000, 1727568000, 1731542400, 1735776000, 1739404800, 1743033600, 1745884800, 1749686400, 1753315200, 1756339200,1759968000]
 REQUEST_TIMEOUT = 30
 BEARER=""
+OUTBOX_TOKEN = os.getenv('OUTBOX_TOKEN', '')  # Bearer that drains queued writes while no task has set one
 TASK = "Idle"
 DOWNLOAD_DIR = Path("download_temp")
 EXTRACT_DIR = Path("extract_temp")
+INI_ONLY_EXTRACT = True
+ZIP_SPOOL_SIZE = 64 * 1024 * 1024  # Zip downloads larger than this spill from memory to DOWNLOAD_DIR
+REMOTE_ZIP = True  # Read zip INIs through HTTP Range requests when the host supports them
 GAME = "WW"
 CATEGORIES = []
-MAX_THREADS = 4
-SLEEP_TIME=2
-TABLE_DATA={}
+MAX_THREADS = 4  # Starting download concurrency; the gamebanana_dl budget adapts it from there
+SLEEP_TIME=2  # Cooldown after a 429/5xx that carries no Retry-After (see ratelimit)
+PREFETCH_LOOKAHEAD = int(os.getenv('PREFETCH_LOOKAHEAD', 16))  # Mod profiles resolved ahead of the download stage
+PREFETCH_WORKERS = int(os.getenv('PREFETCH_WORKERS', 4))  # Minimum profile lookup threads (see _prefetch_workers)
+MAX_FILE_SIZE = 1024 * 1024 * 1024  # Larger files are recorded as too large without downloading
+MAX_INFLIGHT_BYTES = int(os.getenv('MAX_INFLIGHT_BYTES', 2 * 1024 * 1024 * 1024))  # Download bytes admitted at once
+MIN_FREE_DISK = int(os.getenv('MIN_FREE_DISK', 1024 * 1024 * 1024))  # Free space kept on the DOWNLOAD_DIR volume
+SMALL_FILES_FIRST = os.getenv('SMALL_FILES_FIRST', 'True').lower() == 'true'
+ADMISSION_WINDOW = int(os.getenv('ADMISSION_WINDOW', 32))  # Files considered for admission at once
+ADMISSION_MAX_SKIPS = int(os.getenv('ADMISSION_MAX_SKIPS', 64))  # Times the oldest ready file may be passed over for smaller ones
+EXTRACT_WORKERS = int(os.getenv('EXTRACT_WORKERS', os.cpu_count() or 2))  # Extraction/parsing threads (fetch threads: see _fetch_workers)
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', 2))
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 4))  # Jobs buffered between pipeline stages
+INI_DEDUP = "INIB" in db.NOCO_DB_TABLES  # Store INI contents once per distinct blob in the INIB table
+MAP_WORKERS = int(os.getenv('MAP_WORKERS', os.cpu_count() or 1))  # Processes analysing mods during map (1 analyses in-process)
+MAP_MEMORY_BUDGET = int(os.getenv('MAP_MEMORY_BUDGET', 256 * 1024 * 1024))  # Approximate hash graph bytes held before spilling to MAP_SPILL_DIR
+MAP_SPILL_DIR = Path("map_spill")
+HASH_BATCH_SIZE = 25  # Hash records read and written per request while mapping
+INI_PARSE_CACHE_SIZE = 4096  # Parsed INI blobs kept between mods during mapping
+INI_COMPRESSION = os.getenv('INI_COMPRESSION', 'False').lower() == 'true'  # Store INI text zlib-compressed
+INI_COMPRESSED_MARKER = "zlib+b64:"
+TABLE_DATA={}  # Mod Id -> {"id", "modified"} index of the game table
+INDEX_FIELDS = ["Modified"]
+RECORD_PAGE_SIZE = int(os.getenv('RECORD_PAGE_SIZE', 100))  # Records per NocoDB list request
+PAGE_FETCH_WINDOW = int(os.getenv('PAGE_FETCH_WINDOW', 4))  # NocoDB list pages fetched concurrently
 PROGRESS = {
     "total_files_processed": 0,
     "categories_total": 0,
@@ -128,6 +171,8 @@ def get_status():
     return {
         "current_task": TASK,
         "progress": PROGRESS,
+        "rate_limits": ratelimit.snapshot(),
+        "outbox": outbox.stats(),
         "logs": logs[-100:]  # Return last 100 log entries
     }
 
@@ -145,41 +190,248 @@ import re # Import regular expressions
 
 
 
-def get_recr(query_params=None,table=GAME):
-    data = []
+def _count_records(query_params=None, table=None) -> Optional[int]:
+    """Returns the number of records matching query_params' where clause, or None if it cannot be counted."""
+    if 'COUNT' not in db.NOCO_DB_ENDPOINTS:
+        return None
+    params = {'where': query_params['where']} if query_params and 'where' in query_params else None
+    try:
+        response = db.get('COUNT', bearer=BEARER, table=table or GAME, query_params=params)
+        response.raise_for_status()
+        return int(response.json()['count'])
+    except Exception as e:
+        log(f"Could not count NocoDB table {table or GAME}, listing it serially: {e}", level="warn")
+        return None
+
+def _fetch_record_page(page: int, query_params=None, table=None, fields=None) -> list:
+    log(f"Fetching page {page} of NocoDB table {table or GAME}", level="info")
+    params = {**(query_params or {}), 'page': page, 'pageSize': RECORD_PAGE_SIZE}
+    response = db.get('RECORDS', bearer=BEARER, table=table or GAME, query_params=params, fields=fields)
+    response.raise_for_status()
+    return [{"Id": record.get('id'), **record.get('fields', {})} for record in response.json().get('records', [])]
+
+def _iter_record_pages(query_params=None, table=None, fields=None, strict=False):
+    """
+    Yields the records of a NocoDB table page by page, in order.
+    
+    The first page is fetched on its own, so listings that fit in one page
+    cost a single request. When it comes back full and the table can be
+    counted, up to PAGE_FETCH_WINDOW further pages are fetched concurrently by
+    page number; otherwise the `next` links are followed one by one. Pages
+    past the count are still read while they come back full, so rows added
+    during the listing are not lost.
+    
+    Errors end the listing after being logged, or are raised when strict is set.
+    """
+    next_page = 1
+    last_page = 1
+    window = deque()
+    with ThreadPoolExecutor(max_workers=PAGE_FETCH_WINDOW) as executor:
+        try:
+            while TASK != "Stopping":
+                while next_page <= last_page and len(window) < PAGE_FETCH_WINDOW:
+                    window.append(executor.submit(_fetch_record_page, next_page, query_params, table, fields))
+                    next_page += 1
+                if not window:
+                    break
+                records = window.popleft().result()
+                if records:
+                    yield records
+                if next_page == 2 and len(records) == RECORD_PAGE_SIZE:
+                    total = _count_records(query_params, table)
+                    if total is None:
+                        linked_params = {**(query_params or {}), 'page': 2, 'pageSize': RECORD_PAGE_SIZE}
+                        yield from _iter_linked_pages(linked_params, table, fields, strict)
+                        return
+                    last_page = max(2, -(-total // RECORD_PAGE_SIZE))
+                elif not window and next_page > last_page and len(records) == RECORD_PAGE_SIZE:
+                    last_page += 1
+        except requests.exceptions.RequestException as e:
+            log(f"Error listing NocoDB table {table or GAME}: {e}", level="error")
+            if strict:
+                raise
+        except Exception as e:
+            log(f"Unexpected error listing NocoDB: {e}", level="error")
+            if strict:
+                raise
+        finally:
+            for future in window:
+                future.cancel()
+    if strict and TASK=="Stopping":
+        raise RuntimeError("Listing stopped before the end of the table")
+
+def _iter_linked_pages(query_params=None, table=None, fields=None, strict=False):
+    """Yields the records of a NocoDB table page by page by following its `next` links."""
     count=0
-    response = db.get('RECORDS', bearer=BEARER, table=table, query_params=query_params)
+    response = db.get('RECORDS', bearer=BEARER, table=table or GAME, query_params=query_params, fields=fields)
     while TASK!="Stopping":
-        log(f"Fetching page {count} of NocoDB table {table}", level="info")
+        log(f"Fetching page {count} of NocoDB table {table or GAME}", level="info")
         try:
             response.raise_for_status()
             result = response.json()
-            data.extend({"Id": record.get('id'), **record.get('fields', {})} for record in result.get('records', []))
+            yield [{"Id": record.get('id'), **record.get('fields', {})} for record in result.get('records', [])]
             url = result.get('next')
             if not url:
                 break
             response = db.get(url, bearer=BEARER)
         except requests.exceptions.Timeout:
-            log(f"Timeout listing NocoDB table {GAME}", level="error")
+            log(f"Timeout listing NocoDB table {table or GAME}", level="error")
+            if strict:
+                raise
             break
         except requests.exceptions.RequestException as e:
-            log(f"Error listing NocoDB table {GAME}: {e}", level="error")
+            log(f"Error listing NocoDB table {table or GAME}: {e}", level="error")
+            if strict:
+                raise
             break
         except Exception as e:
             log(f"Unexpected error listing NocoDB: {e}", level="error")
+            if strict:
+                raise
             break
         count+=1
-    return data
+    if strict and TASK=="Stopping":
+        raise RuntimeError("Listing stopped before the end of the table")
+
+def _sync_mirror(table: str) -> None:
+    """Brings the local mirror of a table up to date (see mirror.sync)."""
+    mirror.sync(table, lambda where: _iter_record_pages({'where': where} if where else None, table, strict=True))
+
+def iter_recr(query_params=None,table=None,fields=None,strict=False):
+    """
+    Streams the records of a NocoDB table, holding only the pages being fetched in memory.
+    
+    Tables kept in the local mirror are synced and read from it when the
+    query is one the mirror understands. With strict set, a listing that
+    cannot be completed raises instead of ending early.
+    """
+    table = table or GAME
+    records = None
+    if mirror.enabled(table) and set(query_params or {}) <= {'where'}:
+        try:
+            _sync_mirror(table)
+            records = mirror.iter_records(table, (query_params or {}).get('where'), fields)
+        except Exception as e:
+            log(f"Reading {table} from NocoDB, mirror unavailable: {e}", level="warn")
+    if records is not None:
+        yield from records
+        return
+    for records in _iter_record_pages(query_params, table, fields, strict):
+        yield from records
+
+def get_recr(query_params=None,table=None,fields=None):
+    return list(iter_recr(query_params, table, fields))
 
 
+def get_record(table: str, record_id, fields=None) -> Optional[dict]:
+    """Returns the fields of one record, from the local mirror when it has it, or None if it could not be read."""
+    if mirror.enabled(table):
+        try:
+            _sync_mirror(table)
+            record = mirror.get_record(table, record_id)
+            if record is not None:
+                return record
+        except Exception as e:
+            log(f"Reading {table} from NocoDB, mirror unavailable: {e}", level="warn")
+    response = db.get('RECORDS', bearer=BEARER, table=table, record=record_id, fields=fields)
+    if not response.status_code==200:
+        return None
+    return response.json().get('fields',{})
+
+def _stored_data(data) -> dict:
+    """Returns the {file id: data} of a stored mod's Data field, which reads back as a JSON string or already parsed."""
+    if isinstance(data, str):
+        data = json.loads(data or "{}")
+    return data or {}
+
+def _stored_file_ids(mod_id: str) -> Optional[set]:
+    """Loads a stored mod's Data and returns the ids of the files it already has, or None if it could not be read."""
+    record = get_record(GAME, mod_id, fields=["Data"])
+    if record is None:
+        log(f"Failed to fetch mod {mod_id} from DB for updating",level="error")
+        return None
+    return {str(file_id) for file_id in _stored_data(record.get('Data'))}
+
+def _iter_changed_mods():
+    """Yields (category name, mod) for mods of CATEGORIES that are new or were modified since they were stored."""
+    global PROGRESS
+    for category in CATEGORIES:
+        PROGRESS["category"]["total"]=category["count"]
+        PROGRESS["category"]["name"]=category["name"]
+        PROGRESS["category"]["done"]=0
+        PROGRESS["categories_done"]+=1
+        log(f"Category: {category['name']} (ID: {category['id']}, Count: {category['count']})", level="info")
+        
+        for mods in iter_mod_pages(category):
+            for mod in mods:
+                if TASK == "Stopping":
+                    return
+                stored = TABLE_DATA.get(str(mod['id']))
+                if outbox.is_pending(GAME, mod['id']) or (stored and int(stored.get('modified') or 0) >= mod['modified']):
+                    PROGRESS["mods_done"]+=1
+                    PROGRESS["category"]["done"]+=1
+                    continue
+                log(f"Mod {'changed' if stored else 'added'}: {mod}", level="info")
+                yield category['name'], mod
+
+def _only_new_files(mods):
+    """Drops the files a stored mod already has from (category, mod, files) tuples."""
+    for category, mod, files in mods:
+        if str(mod['id']) in TABLE_DATA:
+            known = _stored_file_ids(mod['id'])
+            if known is None:
+                continue
+            files = [file for file in files if str(file['id']) not in known]
+            log(f"Mod {mod['id']} has {len(files)} new file(s).", level="info")
+        yield category, mod, files
+
+def _merge_mod(entry: dict) -> bool:
+    """Saves an updated mod: new mods are posted, changed ones get their new files merged into the stored record."""
+    global PROGRESS
+    mod = entry["mod"]
+    if str(mod['id']) not in TABLE_DATA:
+        return _post_mod(entry)
+    mod_data = get_record(GAME, mod['id'])
+    if mod_data is None:
+        log(f"Failed to fetch mod {mod['id']} from DB for updating",level="error")
+        return False
+    mod_json = _stored_data(mod_data.get('Data'))
+    mod_json.update(entry["data"])
+    outbox.enqueue("patch", 'RECORDS', GAME, [{
+        "id": mod['id'],
+        "fields":{
+            "Modified": mod['modified'],
+            "Data": mod_json
+        }
+    }], record=mod['id'])
+    PROGRESS["mods"].pop(str(mod['id']), None)
+    PROGRESS["mods_done"]+=1
+    if entry['category'] == PROGRESS["category"]["name"]:
+        PROGRESS["category"]["done"]+=1
+    log(f"Queued update of mod {mod['id']} with {len(entry['data'])} new file(s).", level="info")
+    return True
+
 def update():
-    records = list(TABLE_DATA.values())
-    pass
+    """Re-scrapes mods whose GameBanana modification time is newer than the stored one, processing only their new files."""
+    global TASK
+    if not CATEGORIES:
+        log("No categories found.", level="error")
+        TASK="Finished"
+        return 0
+    log(f"Starting update for game {GAME}...", level="info")
+    schedule_mods(_only_new_files(prefetch_files(_iter_changed_mods())), _merge_mod, "update")
+    log("Update completed successfully!", level="finish")
+    
+    if TASK=="Stopping":
+        TASK="Cancelled"
+        log("Task cancelled by user.", level="info")
+    else:    
+        TASK="Finished"
 
 def get_broken_files(mod):
     res=[]
-    mod_id=mod['Id']
-    data=json.loads(mod['Data'])
+    mod_id=mod['id']
+    data=_stored_data(mod['data'])
     files = {
         str(item["id"]): item for item in get_files({"id":mod_id})
     }
@@ -188,80 +440,56 @@ def get_broken_files(mod):
             res.append(files[file_id])
     return res
 
+def _patch_mod(entry: dict) -> bool:
+    """Merges the re-processed files of a mod into its stored record, returning whether it was saved."""
+    global PROGRESS
+    mod_id = entry["mod"]["id"]
+    PROGRESS["mods"].pop(str(mod_id), None)
+    PROGRESS["mods_done"]+=1
+    log(f"All files fixed for mod {mod_id}", level="info")
+    mod_data = get_record(GAME, mod_id)
+    if mod_data is None:
+        log(f"Failed to fetch mod {mod_id} from DB for patching",level="error")
+        return False
+    mod_json = _stored_data(mod_data.get('Data'))
+    mod_json.update(entry["data"])
+    outbox.enqueue("patch", 'RECORDS', GAME, [{
+        "id": mod_id,
+        "fields":{
+            "Data": mod_json
+        }
+    }], record=mod_id)
+    log(f"Queued patch for mod {mod_id}", level="info")
+    return True
+
+def _iter_broken_mods():
+    """Yields (None, mod, broken files) for every stored mod with failed downloads."""
+    global PROGRESS
+    # The listing is read in full before any mod is fixed: patched mods drop out
+    # of the filter, which would shift the pages still to be read past mods
+    # that are still broken
+    broken_mods = [
+        (None, {key.lower(): value for key, value in record.items()})
+        for record in iter_recr(query_params={'where': '(Data, like, err: dl/ex failed)'}, fields=["Data"])
+        # A patch still queued from an earlier run has already fixed what it could
+        if not outbox.is_pending(GAME, record['Id'])
+    ]
+    log(f"Found {len(broken_mods)} mod(s) with failed downloads.", level="info")
+    for category, mod, files in prefetch_files(broken_mods, resolve=get_broken_files):
+        if not files:
+            continue
+        PROGRESS["mods_total"] += 1
+        PROGRESS["categories_total"] += len(files)
+        yield category, {"id": mod["id"]}, files
+
 def fix():
     global PROGRESS, TASK
-    broken_mods = get_recr(query_params={'where': '(Data, like, err: dl/ex failed)'})
-    
-    broken_files=[]
-    mod_to_files={}
-    file_to_mod={}
-    print(f"Total broken mods to fix: {len(broken_mods)}")
-    with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
-        # Submit all file processing tasks
-        future_to_mod = {executor.submit(get_broken_files, mod): mod for mod in broken_mods} 
-        # Wait for all tasks to complete and collect results
-        for future in as_completed(future_to_mod):
-            original_mod = future_to_mod[future]
-            try:
-                files = future.result()
-                if files is None:
-                    files = original_mod 
-                mod_to_files[original_mod['Id']]={
-                    file['id']:True for file in files
-                }
-                for file in files:
-                    file_to_mod[file['id']]=file['parent_id']
-                broken_files.extend(files)
-            except Exception as e:
-                log(f"Exception occurred while processing mod {original_mod['Id']}: {e}", level="error")
-    PROGRESS["mods_total"] = len(mod_to_files.keys())
+    PROGRESS["mods_total"] = 0
     PROGRESS["mods_done"] = 0
-    print(f"Total broken files to fix: {len(broken_files)}, first file: {broken_files[0] if broken_files else 'N/A'}")
-    fixed_files={}
-    for i in range(0,len(broken_files),MAX_THREADS):
-        target = broken_files[i:i+MAX_THREADS]
-        PROGRESS["categories_total"] = len(target)
-        PROGRESS["categories_done"] = 0
-        if TASK=="Stopping":
-            break
-        fixed = batch_process_files(target)
-        print(f"Target files batch {i//MAX_THREADS + 1}: {[file['id'] for file in target]}")
-        print(f"Fixed files batch {i//MAX_THREADS + 1}: {fixed}")
-        if TASK=="Stopping":
-            break
-        for j in target:
-            if j['id'] in fixed:
-                # print(f"File {j['id']} fixed data: {fixed[j['id']]}")
-                if j['parent_id'] not in fixed_files:
-                    fixed_files[j['parent_id']]={}
-                fixed_files[j['parent_id']][j['id']] = fixed[j['id']]
-            del mod_to_files[j['parent_id']][j['id']]
-            # print(mod_to_files)
-            if(mod_to_files[j['parent_id']]=={}):
-                PROGRESS["mods_done"]+=1
-                log(f"All files fixed for mod {j['parent_id']}", level="info")
-                mod_data = db.get('RECORDS', bearer=BEARER, table=GAME, record=j['parent_id'])
-                if not mod_data.status_code==200:
-                    log(f"Failed to fetch mod {j['parent_id']} from DB for patching",level="error")
-                    continue
-                # print(f"Mod data fetched: {mod_data.json()}")
-                mod_json = json.loads(mod_data.json().get('fields',{}).get('Data',"{}"))
-                # print(f"Mod JSON data: {mod_json}")
-                mod_json.update(fixed_files[j['parent_id']])
-                # print(f"Updated Mod JSON data: {mod_json}")
-                patch_res = db.patch('RECORDS', bearer=BEARER, table=GAME, data=[{
-                    "id": j['parent_id'],
-                    "fields":{
-                        "Data": mod_json
-                    }
-                }])
-                print(f"Patch response for mod {j['parent_id']}: {patch_res.status_code}")
-                if patch_res.status_code == 200:
-                    log(f"Successfully patched mod {j['parent_id']}", level="info")
-                del fixed_files[j['parent_id']]
-        if SLEEP_TIME>0:
-            log(f"Sleeping for {SLEEP_TIME} seconds before next batch...", level="info")
-            time.sleep(SLEEP_TIME)
+    PROGRESS["categories_total"] = 0
+    PROGRESS["categories_done"] = 0
+    schedule_mods(_iter_broken_mods(), _patch_mod, "fix")
+    log(f"Fixed {PROGRESS['categories_total']} broken file(s) across {PROGRESS['mods_total']} mod(s).", level="info")
   
     if TASK=="Stopping":
         TASK="Cancelled"
@@ -271,6 +499,19 @@ def fix():
     return True
 
 def map():
+    """
+    Maps hash version chains from the INIs of every mod, incrementally.
+    
+    Each mod's Data is fingerprinted (its INI ids derive from it); mods whose
+    fingerprint matches the one recorded in the journal by the last saved map
+    are skipped. Changed and removed mods have the contribution recorded for
+    them retracted from the hash records before their new one is added.
+    
+    The journal is only committed once every hash record has been written. A
+    journal without mapped mods (first incremental run, journal lost or reset
+    after a failed save) does not describe what the hash records hold, so they
+    are rebuilt: every record is emptied before the full map is saved.
+    """
     global PROGRESS, TASK
     if(not GAME == "WW"):
         log("Mapping is only supported for WW game.", level="error")
@@ -278,24 +519,414 @@ def map():
         return
     PROGRESS["categories_total"]=0
     PROGRESS["categories_done"]=0
-    for mod in TABLE_DATA.values():
+    # Contributions staged by an interrupted run were never saved
+    journal.discard_mapped(GAME)
+    rebuild = not journal.mapped_mods(GAME)
+    if rebuild:
+        log("No mapped mods in the journal, rebuilding the hash records from a full map.", level="warn")
+    seen = set()
+    listed = True
+    # Every mod's changes are merged here and each hash is written once at the end
+    with SpillingGraph(_merge_hash_delta, MAP_MEMORY_BUDGET, MAP_SPILL_DIR) as graph:
+        try:
+            for mod_id, fingerprint, hashes in _iter_mod_hashes():
+                seen.add(str(mod_id))
+                PROGRESS["mods_done"]+=1
+                PROGRESS["categories_total"] += 1
+                if fingerprint is None:
+                    continue
+                delta = _hash_delta(journal.mapped_hashes(GAME, mod_id), hashes or {}, mod_id)
+                if delta:
+                    graph.add(delta)
+                journal.stage_mapped(GAME, mod_id, fingerprint, hashes or {})
+                if hashes:
+                    PROGRESS["categories_done"] += 1
+        except Exception as e:
+            listed = False
+            if TASK!="Stopping":
+                log(f"Mapping stopped before the end of the {GAME} table, mapped hashes were not saved: {e}", level="error")
+        
+        if TASK=="Stopping" or not listed:
+            journal.discard_mapped(GAME)
+            if TASK=="Stopping":
+                log("Task cancelled by user, mapped hashes were not saved.", level="info")
+            TASK="Cancelled"
+            return
+        
+        # The whole table was listed, so mods it did not return were removed
+        for mod_id in journal.mapped_mods(GAME) - seen:
+            log(f"Retracting mapping of removed mod {mod_id}", level="info")
+            graph.add(_hash_delta(journal.mapped_hashes(GAME, mod_id), {}, mod_id))
+            journal.stage_mapped(GAME, mod_id, "", {})
+        
+        log(f"Saving mapped hashes ({len(graph.runs)} spilled run(s)).", level="info")
+        saved = (not rebuild or _reset_hash_records()) and _save_hash_graph(graph.items())
+    if not saved:
+        # The hash records may hold part of this run's changes
+        journal.reset_mapped(GAME)
         if TASK=="Stopping":
-            break
-        log(f"Mapping mod {mod['id']}", level="info")
-        res=analyze_mod(mod)
-        PROGRESS["mods_done"]+=1
-        PROGRESS["categories_total"] += 1
-        if res:
-            PROGRESS["categories_done"] += 1
+            TASK="Cancelled"
+            log("Task cancelled while saving mapped hashes, the next map rebuilds them.", level="info")
+        else:
+            TASK="Finished"
+            log("Mapped hashes could not all be saved, the next map rebuilds them.", level="error")
+        return
+    journal.commit_mapped(GAME)
+    TASK="Finished"
 
+INCOMPLETE_FINGERPRINT = "incomplete"  # Recorded for mods mapped without all of their INIs, so the next map analyses them again
 
-    if TASK=="Stopping":
-        TASK="Cancelled"
-        log("Task cancelled by user.", level="info")
-    else:    
-        TASK="Finished"
+def _mod_fingerprint(mod: Mod) -> str:
+    """Fingerprint of the inputs of a mod's mapping: its Data, which lists its files and their INI counts (so the INI ids)."""
+    data = mod.get("data")
+    return hashlib.sha256((data if isinstance(data, str) else json.dumps(data, sort_keys=True)).encode('utf-8')).hexdigest()
+
+def _expected_ini_ids(files_grouped_by_version: dict) -> set:
+    """Ids ("file id/index") of the INIs the Data of a mod lists for its mapped files."""
+    return {
+        f"{file['id']}/{i}"
+        for files in files_grouped_by_version.values()
+        for file in files
+        for i in range(file.get("ini_count", 0))
+    }
+
+def _iter_mod_hashes():
+    """
+    Yields (mod id, fingerprint, flattened hash data or None) for every mod of the game table.
+    
+    Mods unchanged since the last saved map, and mods whose INIs could not be
+    listed, are yielded with a None fingerprint and not analysed, so their
+    last mapping stays. Mods mapped with some of their INIs missing (e.g. still
+    in the outbox) get INCOMPLETE_FINGERPRINT. INIs are fetched here while up
+    to MAP_WORKERS processes build the hash data of earlier mods, so the
+    pure-Python analysis is not bound to one core by the GIL. Results come
+    back in completion order.
+    
+    Raises if the game table cannot be listed to the end.
+    """
+    # TABLE_DATA only indexes Id/Modified; mods are streamed with their Data instead
+    mods = ({key.lower(): value for key, value in record.items()} for record in iter_recr(strict=True))
+    
+    def prepared(mods):
+        """Yields (mod, fingerprint, _analyze_inis arguments or None) for each mod."""
+        for mod in mods:
+            if TASK=="Stopping":
+                return
+            fingerprint = _mod_fingerprint(mod)
+            if journal.mapped_fingerprint(GAME, mod['id']) == fingerprint:
+                yield mod, None, None
+                continue
+            log(f"Mapping mod {mod['id']}", level="info")
+            try:
+                arguments = _prepare_mod(mod)
+            except Exception as e:
+                log(f"Could not read the INIs of mod {mod['id']}, keeping its last mapping: {e}", level="error")
+                yield mod, None, None
+                continue
+            if arguments is not None:
+                missing = _expected_ini_ids(arguments[1]) - set(arguments[2])
+                if missing:
+                    log(f"Mod {mod['id']} is missing {len(missing)} INI(s), it will be mapped again.", level="warn")
+                    fingerprint = INCOMPLETE_FINGERPRINT
+                PROGRESS["total_files_processed"] += len(arguments[2])
+            yield mod, fingerprint, arguments
+    
+    if MAP_WORKERS <= 1:
+        for mod, fingerprint, arguments in prepared(mods):
+            yield mod['id'], fingerprint, _analyze_inis(*arguments) if arguments else None
+        return
+    
+    pending = {}  # future -> (fingerprint, _analyze_inis arguments)
+    
+    def results(done):
+        for future in done:
+            fingerprint, arguments = pending.pop(future)
+            try:
+                yield arguments[0], fingerprint, future.result()
+            except Exception as e:
+                # A worker dying (e.g. out of memory) breaks the pool; finish its mods here
+                log(f"Map worker failed on mod {arguments[0]}, analysing it in-process: {e}", level="warn")
+                yield arguments[0], fingerprint, _analyze_inis(*arguments)
+    
+    with ProcessPoolExecutor(max_workers=MAP_WORKERS, mp_context=multiprocessing.get_context("spawn")) as executor:
+        for mod, fingerprint, arguments in prepared(mods):
+            if arguments is None:
+                yield mod['id'], fingerprint, None
+                continue
+            try:
+                pending[executor.submit(_analyze_inis, *arguments)] = (fingerprint, arguments)
+            except BrokenProcessPool:
+                yield mod['id'], fingerprint, _analyze_inis(*arguments)
+                continue
+            # Keep every worker busy without queueing the whole table's INIs
+            while len(pending) >= MAP_WORKERS * 2:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                yield from results(done)
+        if TASK=="Stopping":
+            executor.shutdown(cancel_futures=True)
+            return
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            yield from results(done)
+
+def _reset_hash_records() -> bool:
+    """Empties every hash record ahead of a rebuild, returning whether all of them were reset."""
+    try:
+        for records in _iter_record_pages(table="WWH", fields=["Hash"], strict=True):
+            if TASK=="Stopping":
+                return False
+            res = db.patch('RECORDS', bearer=BEARER, table="WWH", data=[{"id": record["Id"], "fields": {"Data": {}}} for record in records])
+            if res.status_code != 200:
+                log(f"Failed to reset {len(records)} hash record(s): {res.status_code} - {res.text}", level="error")
+                return False
+            log(f"Reset {len(records)} hash record(s).", level="info")
+    except Exception as e:
+        log(f"Could not reset the hash records: {e}", level="error")
+        return False
+    return True
+
+def _save_hash_graph(items) -> bool:
+    """
+    Applies a stream of (hash, delta) changes in batches, writing the resulting
+    records to hashes_map.json; returns whether every hash was written.
+    """
+    batch = {}
+    count = 0
+    failed = 0
+    complete = False
     with open('hashes_map.json', 'w', encoding='utf-8') as f:
-        json.dump(good, f, indent=4)
+        f.write("{")
+        
+        def flush(batch):
+            nonlocal count, failed
+            written, not_written = _upsert_hashes(batch)
+            failed += len(not_written)
+            for hash_key, hash_data in written.items():
+                f.write(("," if count else "") + json.dumps(hash_key) + ":" + json.dumps(hash_data, separators=(",", ":")))
+                count += 1
+        
+        for hash_key, hash_data in items:
+            if TASK=="Stopping":
+                break
+            batch[hash_key] = hash_data
+            if len(batch) >= HASH_BATCH_SIZE:
+                flush(batch)
+                batch = {}
+        else:
+            flush(batch)
+            complete = True
+        f.write("}")
+    if failed:
+        log(f"Failed to save {failed} mapped hash(es).", level="error")
+    log(f"Saved {count} mapped hash(es).", level="info")
+    return complete and not failed
+
+def _iter_new_mods():
+    """Yields (category name, mod) for every mod of CATEGORIES not yet in TABLE_DATA, page by page."""
+    global PROGRESS
+    for category in CATEGORIES:
+        PROGRESS["category"]["total"]=category["count"]
+        PROGRESS["category"]["name"]=category["name"]
+        PROGRESS["category"]["done"]=0
+        PROGRESS["categories_done"]+=1
+        log(f"Category: {category['name']} (ID: {category['id']}, Count: {category['count']})", level="info")
+        
+        for mods in iter_mod_pages(category):
+            log(f"Fetched metadata for {len(mods)} mod(s).", level="info")
+            for mod in mods:
+                if TASK == "Stopping":
+                    return
+                if(TABLE_DATA.get(str(mod['id'])) or outbox.is_pending(GAME, mod['id'])):
+                    PROGRESS["mods_done"]+=1
+                    PROGRESS["category"]["done"]+=1
+                    log(f"Skipping mod {mod['id']} as already done.", level="info")
+                    continue
+                
+                log(f"Mod : {mod}", level="info")
+                yield category['name'], mod
+
+def prefetch_files(mods, resolve=None):
+    """
+    Resolves mod profiles ahead of the consumer in a background thread.
+    
+    Category pages are read and get_files is called up to PREFETCH_LOOKAHEAD
+    mods ahead (as many at a time as the API budget admits), so metadata round trips overlap
+    with downloads instead of adding to them.
+    
+    Args:
+        mods: Iterable of (category name, mod) tuples, consumed by the prefetch thread
+        resolve: Returns the files to process for a mod (get_files by default)
+        
+    Yields:
+        (category name, mod, files) tuples in the order of mods; mods whose
+        resolve raised are logged and skipped
+    """
+    ahead = queue.Queue(maxsize=PREFETCH_LOOKAHEAD)
+    stopped = threading.Event()
+    end = object()
+    
+    def put(item):
+        while not stopped.is_set():
+            try:
+                ahead.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+    
+    def produce():
+        try:
+            with ThreadPoolExecutor(max_workers=_prefetch_workers()) as executor:
+                for category, mod in mods:
+                    if stopped.is_set() or TASK == "Stopping":
+                        break
+                    put((category, mod, executor.submit(resolve or get_files, mod)))
+        except Exception as e:
+            log(f"Unexpected error prefetching mods: {e}", level="error")
+        finally:
+            put(end)
+    
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item = ahead.get()
+            if item is end:
+                return
+            category, mod, future = item
+            try:
+                files = future.result()
+            except Exception as e:
+                log(f"Exception occurred while resolving files of mod {mod['id']}: {e}", level="error")
+                continue
+            log(f"Mod ID {mod['id']} has {len(files)} files.", level="info")
+            yield category, mod, files
+    finally:
+        stopped.set()
+
+def _post_mod(entry: dict) -> bool:
+    """Queues the record of a mod whose files have all been processed, returning whether it was saved."""
+    global PROGRESS
+    mod = entry["mod"]
+    data ={
+        "Id" : mod['id'],
+        "Category" : entry['category'],
+        "Added": mod['added'],
+        "Modified": mod['modified'],
+        "Data": entry["data"]
+    }
+    outbox.enqueue("post", "GENERIC", GAME, data, record=mod['id'])
+    PROGRESS["mods"].pop(str(mod['id']), None)
+    PROGRESS["mods_done"]+=1
+    if entry['category'] == PROGRESS["category"]["name"]:
+        PROGRESS["category"]["done"]+=1
+    log(f"Queued mod {mod['id']} data for NocoDB.", level="info")
+    return True
+
+def _admission_size(file: File) -> int:
+    """Bytes a file is expected to occupy while in flight."""
+    size = file.get("size") or 0
+    return 0 if size > MAX_FILE_SIZE else size
+
+def schedule_mods(mods, on_mod_done, journal_task: str) -> None:
+    """
+    Processes the files of many mods through one shared file pipeline.
+    
+    Files are taken from a window of up to ADMISSION_WINDOW ready files across
+    mods (smallest first when SMALL_FILES_FIRST is set) and admitted against
+    the MAX_INFLIGHT_BYTES / MIN_FREE_DISK byte budget, so every stage stays
+    busy across mod boundaries without large downloads exhausting the container.
+    The oldest ready file is admitted next once smaller ones have been picked
+    over it ADMISSION_MAX_SKIPS times, so a large file (and its mod, held until
+    its last file completes) does not wait for the end of the stream.
+    
+    File outcomes are recorded in the resume journal under journal_task as they
+    complete, and files the journal already has are not processed again.
+    
+    Args:
+        mods: Iterable of (category name, mod, files) tuples
+        on_mod_done: Called with {"mod", "category", "data"} once the last file
+            of a mod completes (not called if the task is being stopped); returns
+            whether the mod was saved, which clears its journal entries
+        journal_task: Journal namespace for this task's file outcomes
+    """
+    global PROGRESS
+    budget = ByteBudget(MAX_INFLIGHT_BYTES, MIN_FREE_DISK, DOWNLOAD_DIR)
+    pending = {}  # future -> file
+    entries = {}  # mod id -> {"mod", "category", "data", "remaining"}
+    ready = []  # files waiting for admission
+    passed_over = 0  # smaller files admitted ahead of ready[0]
+    mods = iter(mods)
+    exhausted = False
+    
+    def complete(entry):
+        if on_mod_done(entry):
+            journal.finish_mod(journal_task, GAME, entry["mod"]["id"])
+    
+    def finish(done):
+        for future in done:
+            original_file = pending.pop(future)
+            budget.release(_admission_size(original_file))
+            entry = entries[original_file['parent_id']]
+            data = _file_result(future, original_file)
+            entry["data"][original_file["id"]] = data
+            # Cancelled files fail with a placeholder reason; only keep real outcomes
+            if TASK != "Stopping":
+                journal.record_file(journal_task, GAME, original_file['parent_id'], original_file["id"], data)
+            entry["remaining"] -= 1
+            if entry["remaining"] == 0:
+                del entries[original_file['parent_id']]
+                if TASK != "Stopping":
+                    complete(entry)
+    
+    # Enough jobs to occupy every stage worker plus the queues between them
+    capacity = _fetch_workers() * 2 + EXTRACT_WORKERS + UPLOAD_WORKERS + 2 * PIPELINE_QUEUE_SIZE
+    with file_pipeline() as files_pipeline:
+        while TASK != "Stopping":
+            while not exhausted and len(ready) < ADMISSION_WINDOW:
+                item = next(mods, None)
+                if item is None:
+                    exhausted = True
+                    break
+                category, mod, files = item
+                if mod['id'] in entries:
+                    # Listed twice (e.g. GameBanana pages shifting); its files are already in flight
+                    log(f"Skipping duplicate of mod {mod['id']}, already being processed.", level="warn")
+                    continue
+                finished = journal.finished_files(journal_task, GAME, mod['id'])
+                todo = [file for file in files if str(file['id']) not in finished]
+                entry = {
+                    "mod": mod,
+                    "category": category,
+                    "data": {file['id']: finished[str(file['id'])] for file in files if str(file['id']) in finished},
+                    "remaining": len(todo)
+                }
+                PROGRESS["mods"][str(mod['id'])] = {
+                    "total": len(files),
+                    "done": len(files) - len(todo)
+                }
+                if finished:
+                    log(f"Resuming mod {mod['id']} with {len(files) - len(todo)} file(s) already done.", level="info")
+                if not todo:
+                    complete(entry)
+                    continue
+                entries[mod['id']] = entry
+                ready.extend(todo)
+            if not ready:
+                break
+            
+            if SMALL_FILES_FIRST and passed_over < ADMISSION_MAX_SKIPS:
+                file = min(ready, key=_admission_size)
+            else:
+                file = ready[0]
+            if len(pending) >= capacity or not budget.try_acquire(_admission_size(file)):
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                finish(done)
+                continue
+            passed_over = 0 if file is ready[0] else passed_over + 1
+            ready.remove(file)
+            pending[files_pipeline.submit(_new_job(file, file['parent_id']))] = file
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            finish(done)
 
 def run():
     global PROGRESS,TASK
@@ -311,49 +942,7 @@ def run():
         TASK="Cancelled"
         log("Task cancelled by user.", level="info")
         return
-    for category in CATEGORIES:
-        PROGRESS["category"]["total"]=category["count"]
-        PROGRESS["category"]["name"]=category["name"]
-        PROGRESS["category"]["done"]=0
-        PROGRESS["categories_done"]+=1
-        log(f"Category: {category['name']} (ID: {category['id']}, Count: {category['count']})", level="info")
-        mods = get_mods(category)
-        log(f"Fetched metadata for {len(mods)} mod(s).", level="info")
-        
-        for mod in mods:
-            if TASK == "Stopping":
-                TASK="Cancelled"
-                log("Task cancelled by user.", level="info")
-                return
-            if(TABLE_DATA.get(str(mod['id']))):
-                PROGRESS["mods_done"]+=1
-                PROGRESS["category"]["done"]+=1
-                log(f"Skipping mod {mod['id']} as already done.", level="info")
-                continue
-            
-            log(f"Mod : {mod}", level="info")
-            files = get_files(mod)
-            log(f"Mod ID {mod['id']} has {len(files)} files.", level="info")
-            PROGRESS["mods"][str(mod['id'])] = {
-                "total": len(files),
-                "done": 0
-            }
-            file_data=batch_process_files(files,mod["id"])
-            data ={
-                "Id" : mod['id'],
-                "Category" : category['name'],
-                "Added": mod['added'],
-                "Modified": mod['modified'],
-                "Data": file_data
-            }
-            if( TASK == "Stopping"):
-                continue
-            db.post("GENERIC", bearer=BEARER, table=GAME, data=data)
-            del PROGRESS["mods"][str(mod['id'])]
-            PROGRESS["mods_done"]+=1
-            PROGRESS["category"]["done"]+=1
-            log(f"Uploaded mod {mod['id']} data to NocoDB. Sleeping for {SLEEP_TIME} seconds...", level="info")
-            time.sleep(SLEEP_TIME)
+    schedule_mods(prefetch_files(_iter_new_mods()), _post_mod, "scrape")
     log("Scraping completed successfully!", level="finish")
     
     if TASK=="Stopping":
@@ -363,6 +952,19 @@ def run():
         TASK="Finished"
     pass
 
+def start_outbox(bearer: str = ""):
+    """
+    Starts sending the writes queued in the outbox, including those left by an
+    earlier process. They go out with the bearer of the running task, else
+    with the last one given here (or OUTBOX_TOKEN).
+    """
+    global OUTBOX_TOKEN
+    if bearer:
+        OUTBOX_TOKEN = bearer
+    # A blob given up on must be uploaded again by the next INI with its content
+    outbox.on_failure("INIB", journal.release_blob)
+    outbox.start(lambda: BEARER or OUTBOX_TOKEN, log)
+
 def start_service(task="run",game="WW", bearer="",threads=4,sleep=2):
     global TASK, GAME, BEARER, MAX_THREADS, SLEEP_TIME,PROGRESS
 
@@ -374,6 +976,8 @@ def start_service(task="run",game="WW", bearer="",threads=4,sleep=2):
     SLEEP_TIME = sleep
     GAME = game
     BEARER = bearer
+    ratelimit.reset(cooldown=SLEEP_TIME, concurrency={"gamebanana_dl": MAX_THREADS})
+    start_outbox()
     PROGRESS={
     "total_files_processed": 0,
     "categories_total":0,
@@ -387,7 +991,7 @@ def start_service(task="run",game="WW", bearer="",threads=4,sleep=2):
     
     DOWNLOAD_DIR.mkdir(exist_ok=True, parents=True)
     EXTRACT_DIR.mkdir(exist_ok=True, parents=True)
-    log(f"Starting task: {TASK} for {GAME} with a maximum of {MAX_THREADS} threads and sleep time {SLEEP_TIME}s", level="info")
+    log(f"Starting task: {TASK} for {GAME} starting at {MAX_THREADS} concurrent downloads and a {SLEEP_TIME}s throttling cooldown", level="info")
     if TASK == "Fixing":
         threading.Thread(target=fix).start()
         return True
@@ -435,8 +1039,14 @@ def get_cats(passive=False) -> None:
     return cats
 
 def get_full_table_data():
+    """
+    Loads the Id/Modified index of the game table into TABLE_DATA.
+    
+    Only the columns needed for existence and modification checks are fetched;
+    tasks that need a mod's Data load it themselves.
+    """
     global TABLE_DATA
-    records = get_recr()
+    records = get_recr(fields=INDEX_FIELDS)
    
     TABLE_DATA = {
         record["Id"]: {
@@ -445,10 +1055,10 @@ def get_full_table_data():
     }
     return TABLE_DATA
     
-def get_mods(category: Category) -> list[Mod]:
-    """Fetches mod URLs from a GameBanana category API endpoint."""
-    mods: list[Mod] = []
+def iter_mod_pages(category: Category):
+    """Fetches a GameBanana category page by page, yielding the mods of each page."""
     for i in range(0,category['count'],50):
+        mods: list[Mod] = []
         try:
             response = session.get(
                 API_BASE_URL.format(CATEGORY_SUBURL.format(category['id'],i//50 +1 )), 
@@ -466,10 +1076,8 @@ def get_mods(category: Category) -> list[Mod]:
         except requests.exceptions.RequestException as e:
             log(f"Error fetching category data for page {i//50 + 1}: {e}", level="error")
         except Exception as e:
-            log(f"Unexpected error in get_mods: {e}", level="error")
-    log(f"Fetched {len(mods)} mods from category {category['name']} count {category['count']}.", level="info")
-    sort_by_date_difference(mods)
-    return mods
+            log(f"Unexpected error in iter_mod_pages: {e}", level="error")
+        yield mods
 
 def get_files(mod: Mod) -> list[File]:
     """Fetches file download URLs from a GameBanana mod profile API endpoint."""
@@ -502,37 +1110,21 @@ def get_files(mod: Mod) -> list[File]:
         files.sort(key=lambda x: x['added'])
     return files
 
-def sort_by_date_difference(records: list[Mod]) -> list[Mod]:
-    """
-    Sorts an array of mod records by the biggest difference between 
-    _tsDateModified and _tsDateAdded (descending order).
-    
-    Args:
-        records: List of mod records containing _tsDateModified and _tsDateAdded
-        
-    Returns:
-        Sorted list with biggest differences first
-    """
-    return sorted(
-        records, 
-        key=lambda record: record.get('modified', 0) - record.get('added', 0),
-        reverse=True
-    )
-
 def download_file(url: str, name: str) -> bool:
     """Downloads a file from a URL to a specific path."""
     log(f"Downloading {url}...", level="info")
     
     save_path = DOWNLOAD_DIR / name
     try:
-        response = session.get(url, stream=True, timeout=REQUEST_TIMEOUT)
-        # Check for HTTP errors (e.g., 404 Not Found)
-        response.raise_for_status() 
-        
-        with open(save_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:  # filter out keep-alive chunks
-                    f.write(chunk)
+        # Closing the response returns its download slot to the rate limiter
+        with session.get(url, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            # Check for HTTP errors (e.g., 404 Not Found)
+            response.raise_for_status() 
+            
+            with open(save_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=8192):
+                    if chunk:  # filter out keep-alive chunks
+                        f.write(chunk)
         log("Download complete.", level="info")
         
         return True
@@ -547,6 +1139,123 @@ def download_file(url: str, name: str) -> bool:
         log(f"Unexpected error downloading {url}: {e}", level="error")
         return False
 
+def list_ini_members(src: Path) -> Optional[list[str]]:
+    """
+    Lists the INI members of an archive without extracting it.
+    
+    Args:
+        src: Path to the archive
+        
+    Returns:
+        List of member paths ending in .ini, or None if the archive could not be listed
+    """
+    import subprocess
+    
+    try:
+        result = subprocess.run(
+            ['7z', 'l', '-slt', str(src)],
+            capture_output=True,
+            text=True,
+            errors='replace',
+            timeout=60
+        )
+    except Exception as e:
+        log(f"Error listing {src.name}: {e}", level="warn")
+        return None
+    
+    if result.returncode != 0:
+        log(f"Error listing {src.name} (exit code: {result.returncode})", level="warn")
+        return None
+    
+    # Technical listing: archive header, a "----------" separator, then one
+    # "Key = Value" block per member
+    _, sep, body = result.stdout.partition("\n----------\n")
+    if not sep:
+        return None
+    members = []
+    path = None
+    for line in body.splitlines():
+        if line.startswith("Path = "):
+            path = line[len("Path = "):]
+        elif line.startswith("Folder = ") and path is not None:
+            if line != "Folder = +" and Path(path).match("*.ini"):
+                members.append(path)
+            path = None
+    return members
+
+def download_to_spool(url: str) -> Optional[tempfile.SpooledTemporaryFile]:
+    """Downloads a file from a URL into a spooled temporary file kept in memory up to ZIP_SPOOL_SIZE."""
+    log(f"Downloading {url}...", level="info")
+    
+    spool = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_SIZE, dir=DOWNLOAD_DIR)
+    try:
+        with session.get(url, stream=True, timeout=REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            
+            for chunk in response.iter_content(chunk_size=8192):
+                if chunk:  # filter out keep-alive chunks
+                    spool.write(chunk)
+        spool.seek(0)
+        log("Download complete.", level="info")
+        
+        return spool
+    except requests.exceptions.Timeout:
+        log(f"Timeout downloading {url}", level="error")
+    except requests.exceptions.RequestException as e:
+        log(f"Error downloading {url}: {e}", level="error")
+    except Exception as e:
+        log(f"Unexpected error downloading {url}: {e}", level="error")
+    spool.close()
+    return None
+
+def read_zip_inis(fileobj) -> Optional[list[dict]]:
+    """
+    Reads the INI members of a zip archive in-process.
+    
+    Args:
+        fileobj: Seekable file object containing the archive
+        
+    Returns:
+        List of dictionaries with 'name' and 'content', or None if the archive
+        cannot be read with zipfile (not a zip, encrypted, unsupported compression)
+    """
+    try:
+        with zipfile.ZipFile(fileobj) as archive:
+            members = []
+            for info in archive.infolist():
+                member = PurePosixPath(info.filename.replace("\\", "/"))
+                if not info.is_dir() and member.match("*.ini"):
+                    members.append((member.name, info))
+            if isinstance(fileobj, HttpRangeFile):
+                fileobj.prefetch_members([info for _, info in members])
+            return [decode_ini(name, archive.read(info)) for name, info in members]
+    except Exception as e:
+        log(f"Could not read zip in-process: {e}", level="warn")
+        return None
+
+def read_remote_zip_inis(url: str) -> Optional[list[dict]]:
+    """
+    Reads the INI members of a remote zip through HTTP Range requests, fetching
+    only the central directory and the INI entries.
+    
+    Returns:
+        List of dictionaries with 'name' and 'content', or None if the host does
+        not honor ranges or the file is not a readable zip
+    """
+    try:
+        remote = HttpRangeFile.open(session, url, timeout=REQUEST_TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        log(f"Error probing {url} for range support: {e}", level="warn")
+        return None
+    if remote is None:
+        log(f"Host for {url} does not support range requests.", level="info")
+        return None
+    with remote:
+        inis = read_zip_inis(remote)
+        if inis is not None:
+            log(f"Read {len(inis)} INI(s) remotely using {remote.bytes_fetched} of {remote.size} bytes in {remote.requests} request(s).", level="info")
+        return inis
+
 def extract_file(name:str) -> bool:
     """Extracts a .zip, .rar, or .7z file to a target directory using 7z command-line tool."""
     import subprocess
@@ -557,10 +1266,22 @@ def extract_file(name:str) -> bool:
     # Ensure the extraction directory exists
     tgt.mkdir(exist_ok=True, parents=True)
     
+    # Only INI text is needed, so extract just those members when the archive can be listed
+    args = ['7z', 'x', str(src), f'-o{str(tgt)}', '-y']
+    if INI_ONLY_EXTRACT:
+        members = list_ini_members(src)
+        if members is None:
+            log(f"Could not list {name}, falling back to full extraction.", level="warn")
+        elif not members:
+            log("No INI members found, skipping extraction.", level="info")
+            return True
+        else:
+            args += ['--', *members]
+    
     try:
         # Use 7z for all archive types (.zip, .rar, .7z)
         result = subprocess.run(
-            ['7z', 'x', str(src), f'-o{str(tgt)}', '-y'],
+            args,
             capture_output=True,
             text=True,
             timeout=300  # 5 minute timeout
@@ -592,6 +1313,27 @@ def extract_file(name:str) -> bool:
         log(f"Error extracting {src.name}: {e}", level="error")
         return False
 
+def decode_ini(name: str, raw: bytes) -> dict:
+    """
+    Decodes raw INI bytes as text and returns its name and content.
+    
+    Args:
+        name: File name of the INI
+        raw: File contents as bytes
+        
+    Returns:
+        Dictionary with 'name' and 'content' (UTF-8, falling back to latin-1,
+        with newlines normalized the same way text-mode reads do)
+    """
+    try:
+        content = raw.decode('utf-8')
+    except UnicodeDecodeError:
+        content = raw.decode('latin-1')
+    return {
+        "name": name,
+        "content": content.replace('\r\n', '\n').replace('\r', '\n')
+    }
+
 def read_ini(path: Path) -> dict:
     """
     Reads an INI file as plain text and returns its name and content.
@@ -603,28 +1345,7 @@ def read_ini(path: Path) -> dict:
         Dictionary with 'name' (filename) and 'content' (file contents as string)
     """
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return {
-            "name": path.name,
-            "content": content
-        }
-    except UnicodeDecodeError:
-        # Try with different encoding if UTF-8 fails
-        try:
-            with open(path, 'r', encoding='latin-1') as f:
-                content = f.read()
-            return {
-                "name": path.name,
-                "content": content
-            }
-        except Exception as e:
-            log(f"Error reading {path.name} with alternate encoding: {e}", level="error")
-            
-            return {
-                "name": path.name,
-                "content": ""
-            }
+        return decode_ini(path.name, path.read_bytes())
     except Exception as e:
         log(f"Error reading INI file {path.name}: {e}", level="error")
         
@@ -633,18 +1354,45 @@ def read_ini(path: Path) -> dict:
             "content": ""
         }
 
-def process_ini(id:str,path: Path) -> dict:
-    ini = read_ini(path)
+def encode_ini_text(content: str) -> str:
+    """Encodes INI text for storage, compressing it when INI_COMPRESSION is set."""
+    if not INI_COMPRESSION:
+        return content
+    return INI_COMPRESSED_MARKER + base64.b64encode(zlib.compress(content.encode('utf-8'), 9)).decode('ascii')
+
+def decode_ini_text(data: str) -> str:
+    """Decodes stored INI text, accepting both compressed and plain records."""
+    if not data or not data.startswith(INI_COMPRESSED_MARKER):
+        return data or ""
+    return zlib.decompress(base64.b64decode(data[len(INI_COMPRESSED_MARKER):])).decode('utf-8')
+
+def ini_hash(content: str) -> str:
+    """Content address of an INI's text."""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+def process_ini(id:str,ini: dict) -> dict:
+    content = ini.get("content", "")
+    if INI_DEDUP:
+        # The text itself is stored once in INIB under its hash
+        return {
+            "Id": id,
+            "Name": ini.get("name", ""),
+            "Hash": ini_hash(content)
+        }
     return {
         "Id": id,
         "Name": ini.get("name", ""),
-        "Data": ini.get("content", "")
+        "Data": encode_ini_text(content)
     }
 
-def upload_ini(ini_data: dict) -> dict:
+def upload_ini(ini_data: dict, content: str = "") -> bool:
+    """Queues an INI record (and its blob, the first time that content is seen) for upload."""
     if TASK == "Stopping":
-        return
-    return db.post("GENERIC", bearer=BEARER, table="INI", data=ini_data)
+        return False
+    if "Hash" in ini_data and journal.claim_blob(ini_data["Hash"]):
+        outbox.enqueue("post", "GENERIC", "INIB", {"Hash": ini_data["Hash"], "Data": encode_ini_text(content)}, record=ini_data["Hash"])
+    outbox.enqueue("post", "GENERIC", "INI", ini_data, record=ini_data["Id"])
+    return True
 
 def cleanup(name:str):
     """Deletes the specified file and directory."""
@@ -664,80 +1412,157 @@ def cleanup(name:str):
         log(f"Error during cleanup: {e}", level="error")
         
 
-def process_file(file: File, mod_id="") -> Optional[File]:
+def _new_job(file: File, mod_id="") -> dict:
+    """Starts tracking a file and returns the job passed between pipeline stages."""
     global PROGRESS
     PROGRESS["files"][str(file['id'])] = {}
     if mod_id:
         PROGRESS["mods"][str(mod_id)]["done"] += 1
     log(f"Processing file ID {file['id']} (Size: {file['size']} bytes)...", level="info")
-    name = f'{file["id"]}.{file["ext"]}'
     file["data"]={
         "status":"failed",
         "reason":"err: dl/ex failed",
         "added":file["added"]
     }
-    if file["size"] > 1024*1024*1024:  # Skip files larger than 100MB
+    job = {
+        "file": file,
+        "name": f'{file["id"]}.{file["ext"]}',
+        "inis": None,  # list of {'name', 'content'} once read
+        "spool": None,  # zip download held in memory for the extract stage
+        "done": False,  # set when the remaining stages should be skipped
+    }
+    if file["size"] > MAX_FILE_SIZE:
         file['data']['reason']="err: too large"
-        return file
-    try:
-       
-        if TASK == "Stopping" or not download_file(API_DL_URL.format(file['id']), name) or not extract_file(name):
-            return file
-        ini_files = list((EXTRACT_DIR/Path(name).stem).rglob("*.ini"))
-        if len(ini_files) == 0:
-            file['data']['reason']="no ini"
-            return file
-        for i in range(len(ini_files)):
-            id = f"{GAME}/{file['parent_id']}/{file['id']}/{i}"
-            upload_ini(process_ini(id, ini_files[i]))
-        file["data"]["status"]="success"
-        file["data"]["ini_count"]=len(ini_files)
-        del file["data"]["reason"]
-    except Exception as e:
-        file['data']['reason']=f"err: {e}"
-        log(f"An unexpected error occurred for {file['id']}: {e}", level="error") 
-        
-    finally:
-        # 5. Delete zip/unzipped data (runs even if errors occurred)
-        cleanup(name)
-        print("-" * 40)
-        PROGRESS["total_files_processed"] += 1
-        del PROGRESS["files"][str(file['id'])]
+        job["done"] = True
+    return job
+
+def _fetch_stage(job: dict) -> dict:
+    """
+    Network stage: reads zip INIs remotely through Range requests when possible,
+    otherwise downloads zips to a memory spool and other archives to DOWNLOAD_DIR.
+    """
+    file = job["file"]
+    if job["done"] or TASK == "Stopping":
+        job["done"] = True
+        return job
+    url = API_DL_URL.format(file['id'])
+    if file["ext"].lower() == "zip":
+        if REMOTE_ZIP:
+            job["inis"] = read_remote_zip_inis(url)
+            if job["inis"] is not None:
+                return job
+        job["spool"] = download_to_spool(url)
+        job["done"] = job["spool"] is None
+    elif not download_file(url, job["name"]):
+        job["done"] = True
+    return job
+
+def _extract_stage(job: dict) -> dict:
+    """
+    CPU stage: reads INIs from the spooled zip in-process, or extracts them with
+    7z (also used for zips that zipfile cannot handle).
+    """
+    name = job["name"]
+    if job["done"] or job["inis"] is not None:
+        return job
+    if job["spool"] is not None:
+        with job["spool"] as spool:
+            job["spool"] = None
+            job["inis"] = read_zip_inis(spool)
+            if job["inis"] is not None:
+                return job
+            log(f"Falling back to 7z for {name}.", level="warn")
+            spool.seek(0)
+            with open(DOWNLOAD_DIR / name, 'wb') as f:
+                shutil.copyfileobj(spool, f)
+    
+    if TASK == "Stopping" or not extract_file(name):
+        job["done"] = True
+        return job
+    job["inis"] = [read_ini(path) for path in (EXTRACT_DIR/Path(name).stem).rglob("*.ini")]
+    return job
+
+def _upload_stage(job: dict) -> dict:
+    """Database stage: queues the INIs of a file for upload and records its outcome."""
+    file = job["file"]
+    if job["done"]:
+        return job
+    ini_files = job["inis"]
+    if len(ini_files) == 0:
+        file['data']['reason']="no ini"
+        return job
+    for i in range(len(ini_files)):
+        id = f"{GAME}/{file['parent_id']}/{file['id']}/{i}"
+        # Already queued before a restart
+        if journal.is_ini_recorded(id):
+            continue
+        if upload_ini(process_ini(id, ini_files[i]), ini_files[i].get("content", "")):
+            journal.record_ini(id)
+    file["data"]["status"]="success"
+    file["data"]["ini_count"]=len(ini_files)
+    del file["data"]["reason"]
+    return job
+
+def _finish_job(job: dict, error: Optional[Exception] = None) -> File:
+    """Deletes a file's temporary data and returns the file, whichever stage it stopped at."""
+    global PROGRESS
+    file = job["file"]
+    if error is not None:
+        file['data']['reason']=f"err: {error}"
+        log(f"An unexpected error occurred for {file['id']}: {error}", level="error") 
+    if job["spool"] is not None:
+        job["spool"].close()
+    cleanup(job["name"])
+    print("-" * 40)
+    PROGRESS["total_files_processed"] += 1
+    del PROGRESS["files"][str(file['id'])]
     return file
 
+def _fetch_workers() -> int:
+    """
+    Fetch stage threads: enough for the largest window of the download budget,
+    which is what limits concurrent downloads (see ratelimit.HostBudget).
+    """
+    return max(MAX_THREADS, ratelimit.max_concurrency("gamebanana_dl"))
+
+def _prefetch_workers() -> int:
+    """Profile lookup threads, sized for the largest window of the GameBanana API budget."""
+    return max(PREFETCH_WORKERS, ratelimit.max_concurrency("gamebanana_api"))
+
+def file_pipeline() -> Pipeline:
+    """Builds the fetch -> extract -> upload pipeline with independently sized worker pools."""
+    return Pipeline(
+        [
+            ("fetch", _fetch_stage, _fetch_workers()),
+            ("extract", _extract_stage, EXTRACT_WORKERS),
+            ("upload", _upload_stage, UPLOAD_WORKERS),
+        ],
+        queue_size=PIPELINE_QUEUE_SIZE,
+        finalize=_finish_job
+    )
 
-def batch_process_files(files: list[File], mod_id="") -> dict:
-    """Process files concurrently using a thread pool."""
-    global PROGRESS, TASK
-    processed_files = {}
-    # Use ThreadPoolExecutor for concurrent processing
-    with ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
-        # Submit all file processing tasks
-        future_to_file = {executor.submit(process_file, file, mod_id): file for file in files}
+def _file_result(future, original_file: File) -> dict:
+    """Returns the data of a completed file job future, logging its outcome."""
+    global PROGRESS
+    try:
+        file = future.result()
+        if file is None:
+            file = original_file
         
-        # Wait for all tasks to complete and collect results
-        for future in as_completed(future_to_file):
-            original_file = future_to_file[future]
-            try:
-                file = future.result()
-                if file is None:
-                    file = original_file
-                
-                if file["data"]["status"] == "success":
-                    log(f"Processed file {file['id']} successfully with {file['data']['ini_count']} INI files.", level="info")
-                else:
-                    log(f"Failed to process file {file['id']}: {file['data']['reason']}", level="warn")
-                if(TASK == "Fixing"):
-                    PROGRESS["categories_done"] += 1
-                processed_files[file["id"]] = file["data"]
-            except Exception as e:
-                log(f"Exception occurred while processing file {original_file['id']}: {e}", level="error")
-                processed_files[original_file["id"]] = {
-                    "status": "failed",
-                    "reason": f"err: exception - {e}",
-                    "added": original_file["added"]
-                }
-    return processed_files
+        if file["data"]["status"] == "success":
+            log(f"Processed file {file['id']} successfully with {file['data']['ini_count']} INI files.", level="info")
+        else:
+            log(f"Failed to process file {file['id']}: {file['data']['reason']}", level="warn")
+        if(TASK == "Fixing"):
+            PROGRESS["categories_done"] += 1
+        return file["data"]
+    except Exception as e:
+        log(f"Exception occurred while processing file {original_file['id']}: {e}", level="error")
+        return {
+            "status": "failed",
+            "reason": f"err: exception - {e}",
+            "added": original_file["added"]
+        }
 
 def add_ver(a,b,c,d)->float:
     return round((a*b + c*d)/(b+d),3)
@@ -760,11 +1585,9 @@ def _parse_mod_data(mod: Mod) -> Optional[list]:
 
 def _get_file_version(file_added: int) -> float:
     """Determine the version based on file added timestamp."""
-    file_version = file_added
-    for i in range(len(VERSION_TIME)):
-        if file_added >= VERSION_TIME[i]:
-            file_version = VERSIONS[i]
-    return file_version
+    # Latest version released at or before the file; VERSION_TIME is ascending
+    i = bisect_right(VERSION_TIME, file_added) - 1
+    return VERSIONS[i] if i >= 0 else file_added
 
 
 def _group_files_by_version(files: list) -> dict:
@@ -781,16 +1604,60 @@ def _group_files_by_version(files: list) -> dict:
     return files_grouped_by_version
 
 
-def _fetch_ini_files(mod_id: str) -> dict:
-    """Fetch and parse INI files for a mod."""
+ini_parse_cache = OrderedDict()  # content hash -> parsed INI, least recently used first
+ini_parse_lock = threading.Lock()
+
+def _parse_ini_cached(content_hash: str, content: str) -> dict:
+    """Parses INI content once per distinct hash, returning a copy the caller may modify."""
+    with ini_parse_lock:
+        parsed = ini_parse_cache.get(content_hash)
+        if parsed is not None:
+            ini_parse_cache.move_to_end(content_hash)
+            return dict(parsed)
+    parsed = parse_ini_by_hash(content)
+    with ini_parse_lock:
+        ini_parse_cache[content_hash] = parsed
+        if len(ini_parse_cache) > INI_PARSE_CACHE_SIZE:
+            ini_parse_cache.popitem(last=False)
+    return dict(parsed)
+
+def _fetch_ini_blobs(hashes: set) -> dict:
+    """Fetch INI contents from the INIB table, keyed by hash; raises if they cannot be listed."""
+    blobs = {}
+    hashes = sorted(hashes)
+    for i in range(0, len(hashes), 25):
+        where = "~or".join(f"(Hash,eq,{h})" for h in hashes[i:i+25])
+        for blob in iter_recr(query_params={'where': where}, table="INIB", strict=True):
+            blobs[blob["Hash"]] = decode_ini_text(blob.get("Data"))
+    return blobs
+
+def _fetch_ini_texts(mod_id: str) -> dict:
+    """
+    Fetch the INI files of a mod as {ini id: {"name", "hash", "content"}}.
+    
+    Raises if they cannot be listed; INIs whose blob is not stored (yet) are left out.
+    """
     prefix = f"{GAME}/{mod_id}/"
-    return {
-        file["Id"].replace(prefix, ""): {
+    records = list(iter_recr(query_params={'where': f"(Id, like, {prefix}%)"}, table="INI", strict=True))
+    # Deduplicated records reference their text by hash; older ones carry it inline
+    blobs = _fetch_ini_blobs({file["Hash"] for file in records if file.get("Hash") and file.get("Data") is None})
+    inis = {}
+    for file in records:
+        content_hash = file.get("Hash")
+        if content_hash and file.get("Data") is None:
+            content = blobs.get(content_hash)
+            if content is None:
+                log(f"INI blob {content_hash} for {file['Id']} not found.", level="warn")
+                continue
+        else:
+            content = decode_ini_text(file.get("Data"))
+            content_hash = ini_hash(content)
+        inis[file["Id"].replace(prefix, "")] = {
             "name": file["Name"],
-            "data": parse_ini_by_hash(file["Data"])
+            "hash": content_hash,
+            "content": content
         }
-        for file in get_recr(query_params={'where': f"(Id, like, {prefix})"}, table="INI")
-    }
+    return inis
 
 
 def _collect_version_inis(files_grouped_by_version: dict, inis: dict) -> list:
@@ -813,17 +1680,21 @@ def _collect_version_inis(files_grouped_by_version: dict, inis: dict) -> list:
 def _merge_version_inis(version_inis: list) -> dict:
     """Merge INI data for a version, handling duplicates."""
     merged_data = {}
+    # Every prefix of a merged key -> the first merged key with that prefix
+    first_with_prefix = {}
     for file in version_inis:
         for i, ini in enumerate(file["inis"]):
-            exists = [k for k in merged_data.keys() if k.startswith(ini["name"])]
+            existing = first_with_prefix.get(ini["name"])
             key = ini["name"]
             
-            if i != 0 and exists:
+            if i != 0 and existing is not None:
                 key += f'_{i}'
             
-            if not exists or key not in merged_data:
+            if existing is None or key not in merged_data:
                 merged_data[key] = ini["data"]
-            elif ini["data"] != merged_data[exists[0]]:
+                for end in range(len(key) + 1):
+                    first_with_prefix.setdefault(key[:end], key)
+            elif ini["data"] != merged_data[existing]:
                 merged_data[key].update(ini["data"])
     
     return merged_data
@@ -851,17 +1722,25 @@ def _group_inis_by_name(inis_grouped_by_version: dict) -> dict:
     return inis_grouped_by_name
 
 
-def _build_next_candidates(hash_list: list, current_obj: dict) -> dict:
-    """Build next version candidates for a hash."""
-    candidates = [x for x in hash_list if x["ver"] >= current_obj["ver"] and x["hash"] != current_obj["hash"]]
+def _group_hash_list(hash_list: list) -> dict:
+    """Count the hashes of a version-sorted hash list per version, in list order."""
+    version_counts = {}
+    for hash_obj in hash_list:
+        counts = version_counts.setdefault(hash_obj["ver"], {})
+        counts[hash_obj["hash"]] = counts.get(hash_obj["hash"], 0) + 1
+    return version_counts
+
+
+def _build_next_candidates(version_counts: dict, current_obj: dict) -> dict:
+    """Build next version candidates for a hash from the grouped hash list of its key."""
     next_versions = {}
     
-    for candidate in candidates:
-        if candidate["ver"] not in next_versions:
-            next_versions[candidate["ver"]] = {}
-        if candidate["hash"] not in next_versions[candidate["ver"]]:
-            next_versions[candidate["ver"]][candidate["hash"]] = 0
-        next_versions[candidate["ver"]][candidate["hash"]] += 1
+    for ver, counts in version_counts.items():
+        # Versions compare as strings, as they always have
+        if ver >= current_obj["ver"]:
+            candidates = {hash_id: count for hash_id, count in counts.items() if hash_id != current_obj["hash"]}
+            if candidates:
+                next_versions[ver] = candidates
     
     return next_versions
 
@@ -916,9 +1795,10 @@ def _process_hash_mappings(inis_grouped_by_name: dict, mod_id: str) -> dict:
             
             hash_list = [{"hash": k, "ver": v} for k, v in hash_versions.items()]
             hash_list.sort(key=lambda x: float(x["ver"]))
+            version_counts = _group_hash_list(hash_list)
             
             for hash_obj in hash_list:
-                next_data = _build_next_candidates(hash_list, hash_obj)
+                next_data = _build_next_candidates(version_counts, hash_obj)
                 _merge_hash_data(hashes, hash_obj["hash"], hash_obj["ver"], next_data, mod_id)
     
     return hashes
@@ -958,23 +1838,97 @@ def _merge_existing_hash_data(existing_data: dict, new_data: dict) -> dict:
     return existing_data
 
 
-def _upsert_hash(hash_key: str, hash_data: dict) -> None:
-    """Insert or update hash data in the database."""
+RETRACTED_MODS = "-mod"  # Key of a hash delta version listing mods to remove
+
+
+def _hash_delta(old: dict, new: dict, mod_id: str) -> dict:
+    """
+    Difference between two flattened hash data of one mod, per hash.
+    
+    Counts are the amounts to add (negative to retract), "mod" lists the mod
+    where it newly maps a hash version and RETRACTED_MODS where it no longer
+    does. With nothing old, the delta is the new data itself.
+    """
+    delta = {}
+    for hash_key in list(new) + [h for h in old if h not in new]:
+        old_versions, new_versions = old.get(hash_key, {}), new.get(hash_key, {})
+        for ver in list(new_versions) + [v for v in old_versions if v not in new_versions]:
+            old_entry, new_entry = old_versions.get(ver), new_versions.get(ver)
+            entry = {}
+            for next_ver in list(new_entry or {}) + [v for v in (old_entry or {}) if v not in (new_entry or {})]:
+                if next_ver == "mod":
+                    continue
+                old_counts, new_counts = (old_entry or {}).get(next_ver, {}), (new_entry or {}).get(next_ver, {})
+                counts = {}
+                for hash_id in list(new_counts) + [h for h in old_counts if h not in new_counts]:
+                    diff = new_counts.get(hash_id, 0) - old_counts.get(hash_id, 0)
+                    if diff:
+                        counts[hash_id] = diff
+                if counts:
+                    entry[next_ver] = counts
+            if new_entry is not None and old_entry is None:
+                entry["mod"] = new_entry.get("mod", [mod_id])
+            elif old_entry is not None and new_entry is None:
+                entry[RETRACTED_MODS] = [mod_id]
+            if entry:
+                delta.setdefault(hash_key, {})[ver] = entry
+    return delta
+
+
+def _merge_hash_delta(existing: dict, new: dict) -> dict:
+    """Merge two hash deltas of one hash, as map accumulates them across mods."""
+    for ver, entry in new.items():
+        target = existing.setdefault(ver, {})
+        for key, value in entry.items():
+            if key in ("mod", RETRACTED_MODS):
+                target[key] = list(set(target.get(key, []) + value))
+            else:
+                counts = target.setdefault(key, {})
+                for hash_id, count in value.items():
+                    counts[hash_id] = counts.get(hash_id, 0) + count
+    return existing
+
+
+def _apply_hash_delta(existing_data: dict, delta: dict) -> dict:
+    """Apply a hash delta to stored hash data, dropping counts, versions and mods it retracts."""
+    for ver, entry in delta.items():
+        target = existing_data.setdefault(ver, {})
+        for key, value in entry.items():
+            if key == "mod":
+                target["mod"] = list(set(target.get("mod", []) + value))
+            elif key == RETRACTED_MODS:
+                target["mod"] = [mod for mod in target.get("mod", []) if mod not in value]
+            else:
+                counts = target.setdefault(key, {})
+                for hash_id, count in value.items():
+                    counts[hash_id] = counts.get(hash_id, 0) + count
+                    if counts[hash_id] <= 0:
+                        del counts[hash_id]
+                if not counts:
+                    del target[key]
+        if not any(key != "mod" for key in target) and not target.get("mod"):
+            del existing_data[ver]
+    return existing_data
+
+
+def _upsert_hash(hash_key: str, hash_data: dict, merge=_merge_existing_hash_data) -> Optional[dict]:
+    """Insert or update hash data in the database, returning the data written (None on failure)."""
+    data = merge({}, hash_data)
     res = db.post('GENERIC', bearer=BEARER, table="WWH", data={
         "Hash": hash_key,
-        "Data": json.dumps(hash_data)
+        "Data": json.dumps(data)
     })
     
     if res.status_code == 200:
         log(f"Upserted hash {hash_key} successfully.", level="info")
+        return data
     else:
         # Try to update existing record
-        res = db.get('RECORDS', bearer=BEARER, table="WWH", record=hash_key)
-        if res.status_code == 200:
-            record = res.json().get('fields', {})
+        record = get_record("WWH", hash_key)
+        if record is not None:
             existing_data = json.loads(record.get('Data', '{}'))
             
-            merged_data = _merge_existing_hash_data(existing_data, hash_data)
+            merged_data = merge(existing_data, hash_data)
             
             patch_res = db.patch('RECORDS', bearer=BEARER, table="WWH", data=[{
                 "id": hash_key,
@@ -985,54 +1939,90 @@ def _upsert_hash(hash_key: str, hash_data: dict) -> None:
             
             if patch_res.status_code == 200:
                 log(f"Patched existing hash {hash_key} successfully.", level="info")
+                return merged_data
             else:
                 log(f"Failed to patch existing hash {hash_key}: {patch_res.status_code} - {patch_res.text}", level="error")
+    return None
 
 
-def analyze_mod(mod: Mod) -> bool:
-    """Analyze a mod to build hash version mappings."""
-    global PROGRESS, TASK, good
+def _upsert_hashes(deltas: dict) -> tuple:
+    """
+    Apply hash deltas to many hash records, HASH_BATCH_SIZE at a time,
+    returning the data written per hash and the hashes that were not written
+    (failed requests, or left over when the task is stopped).
     
+    Existing records of a batch are read with one query and updated locally,
+    then new records are created with one bulk post and existing ones updated
+    with one patch. A batch whose bulk create is rejected (e.g. a hash created
+    meanwhile) falls back to upserting its new hashes one by one.
+    """
+    written = {}
+    hash_keys = list(deltas)
+    bulk = "BULK" in db.NOCO_DB_ENDPOINTS
+    for i in range(0, len(hash_keys), HASH_BATCH_SIZE):
+        if TASK == "Stopping":
+            break
+        batch = hash_keys[i:i+HASH_BATCH_SIZE]
+        where = "~or".join(f"(Hash,eq,{h})" for h in batch)
+        try:
+            existing = {record["Hash"]: json.loads(record.get("Data") or "{}") for record in iter_recr(query_params={'where': where}, table="WWH", strict=True)}
+        except Exception as e:
+            log(f"Could not read {len(batch)} hash record(s), skipping them: {e}", level="error")
+            continue
+        created = {h: _apply_hash_delta({}, deltas[h]) for h in batch if h not in existing}
+        updated = {h: _apply_hash_delta(existing[h], deltas[h]) for h in batch if h in existing}
+        one_by_one = not bulk
+        if created and bulk:
+            res = db.post('BULK', bearer=BEARER, table="WWH", data=[{"Hash": h, "Data": json.dumps(data)} for h, data in created.items()])
+            if res.status_code == 200:
+                log(f"Created {len(created)} hash record(s).", level="info")
+                written.update(created)
+            else:
+                log(f"Bulk create of {len(created)} hash record(s) failed, upserting one by one: {res.status_code} - {res.text}", level="warn")
+                one_by_one = True
+        if created and one_by_one:
+            for h in created:
+                data = _upsert_hash(h, deltas[h], merge=_apply_hash_delta)
+                if data is not None:
+                    written[h] = data
+        if updated:
+            res = db.patch('RECORDS', bearer=BEARER, table="WWH", data=[{"id": h, "fields": {"Data": data}} for h, data in updated.items()])
+            if res.status_code == 200:
+                log(f"Patched {len(updated)} existing hash record(s).", level="info")
+                written.update(updated)
+            else:
+                log(f"Failed to patch {len(updated)} existing hash record(s): {res.status_code} - {res.text}", level="error")
+    return written, [h for h in hash_keys if h not in written]
+
+
+def _prepare_mod(mod: Mod) -> Optional[tuple]:
+    """Parse a mod's data and fetch its INI texts, returning the arguments of _analyze_inis or None if there is nothing to map."""
     # Parse and validate mod data
     parsed_data = _parse_mod_data(mod)
     if parsed_data is None:
-        return False
-    
-    mod["data"] = parsed_data
+        return None
     
     # Group files by version
-    files_grouped_by_version = _group_files_by_version(mod["data"])
+    files_grouped_by_version = _group_files_by_version(parsed_data)
     
     if len(files_grouped_by_version) < 2:
         log("Not enough versions to map.", level="info")
-        return False
+        return None
     
-    # Fetch and process INI files
-    inis = _fetch_ini_files(mod['id'])
+    return mod['id'], files_grouped_by_version, _fetch_ini_texts(mod['id'])
+
+
+def _analyze_inis(mod_id: str, files_grouped_by_version: dict, ini_texts: dict) -> dict:
+    """Build the flattened hash data of a mod from its INI texts; CPU only, so it can run in a map worker process."""
+    inis = {
+        ini_id: {"name": ini["name"], "data": _parse_ini_cached(ini["hash"], ini["content"])}
+        for ini_id, ini in ini_texts.items()
+    }
     inis_grouped_by_version = _group_inis_by_version(files_grouped_by_version, inis)
     inis_grouped_by_name = _group_inis_by_name(inis_grouped_by_version)
     
     # Build hash mappings
-    hashes = _process_hash_mappings(inis_grouped_by_name, mod['id'])
-    
-    # Update progress
-    PROGRESS["total_files_processed"] += len(inis)
+    hashes = _process_hash_mappings(inis_grouped_by_name, mod_id)
     
     # Flatten hash data
-    hashes = _flatten_hash_data(hashes)
-    good.append(hashes)
-    
-    # Upsert hash data to database
-    for hash_key, hash_obj in hashes.items():
-        if TASK == "Stopping":
-            break
-        _upsert_hash(hash_key, hash_obj)
-    
-    if TASK == "Stopping":
-        return False
-    
-    # Save to temp file for debugging
-    with open("temp.json", "w", encoding="utf-8") as f:
-        json.dump(hashes, f, ensure_ascii=False, indent=4)
-    
-    return True
\ No newline at end of file
+    return _flatten_hash_data(hashes)
@@ -1,16 +1,66 @@
+import threading
+import weakref
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+import ratelimit
 session = requests.Session()
 retry_strategy = Retry(
-    total=3,  # Total number of retries
-    backoff_factor=1,  # Wait 1, 2, 4 seconds between retries
-    status_forcelist=[429, 500, 502, 503, 504],  # Retry on these HTTP status codes
+    total=3,  # Total number of retries for connection and read errors
+    backoff_factor=0.5,
+    respect_retry_after_header=False,  # 429/5xx and Retry-After are handled by the rate limiter
     allowed_methods=["GET", "POST", "PATCH"]  # Retry on GET and POST
 )
-adapter = HTTPAdapter(max_retries=retry_strategy, pool_connections=10, pool_maxsize=20)
+MAX_ATTEMPTS = 4  # Attempts per request when the remote answers 429/5xx
+
+class RateLimitedAdapter(HTTPAdapter):
+    """HTTPAdapter that paces requests through the per-host budgets in ratelimit."""
+
+    def send(self, request, **kwargs):
+        budget = ratelimit.budget_for(request.url)
+        if budget is None:
+            return super().send(request, **kwargs)
+        for attempt in range(MAX_ATTEMPTS):
+            budget.acquire()
+            try:
+                response = super().send(request, **kwargs)
+            except Exception:
+                budget.release(None)
+                raise
+            release = release_once(budget, response.status_code, ratelimit.parse_retry_after(response.headers.get('Retry-After')))
+            if response.status_code not in ratelimit.BACKOFF_STATUSES or attempt == MAX_ATTEMPTS - 1:
+                if kwargs.get('stream'):
+                    # A streamed body is still being downloaded; keep the slot until the response is closed
+                    hold_until_closed(response, release)
+                else:
+                    release()
+                return response
+            release()
+            response.close()
+        return response
+
+def release_once(budget, status, retry_after):
+    """Returns a callable that releases a budget slot the first time it is called."""
+    pending = threading.Lock()
+    def release():
+        if pending.acquire(blocking=False):
+            budget.release(status, retry_after)
+    return release
+
+def hold_until_closed(response, release):
+    """Releases a streamed response's budget slot when it is closed (or garbage collected, should a caller forget)."""
+    close = response.close
+    def closing():
+        try:
+            close()
+        finally:
+            release()
+    response.close = closing
+    weakref.finalize(response, release)
+
+adapter = RateLimitedAdapter(max_retries=retry_strategy, pool_connections=10, pool_maxsize=20)
 session.mount("http://", adapter)
 session.mount("https://", adapter)
 
 def get_session():
-    return session
\ No newline at end of file
+    return session
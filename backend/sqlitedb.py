@@ -0,0 +1,51 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+
+class Database:
+    """
+    A SQLite file shared by the threads of the process.
+
+    The file is opened on first use in WAL mode (readers do not block the
+    writer) with synchronous=NORMAL, and the statements of schema are run
+    once to create its tables. Every statement runs under one lock and is
+    committed straight away, or rolled back if it fails.
+    """
+
+    def __init__(self, path: str, schema: list):
+        self.path = path
+        self.schema = schema
+        self.connection = None
+        self.lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        """Opens the database on first use, creating its tables if needed."""
+        with self.lock:
+            if self.connection is None:
+                connection = sqlite3.connect(self.path, check_same_thread=False)
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.execute("PRAGMA synchronous=NORMAL")
+                for statement in self.schema:
+                    connection.execute(statement)
+                connection.commit()
+                self.connection = connection
+            return self.connection
+
+    def execute(self, sql: str, params=()) -> list:
+        """Runs a statement and commits it, returning the rows it selected."""
+        with self.transaction() as connection:
+            return connection.execute(sql, params).fetchall()
+
+    def executemany(self, sql: str, rows: list) -> None:
+        with self.transaction() as connection:
+            connection.executemany(sql, rows)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Holds the lock for several statements, committed together or rolled back on error."""
+        connection = self.connect()
+        with self.lock:
+            with connection:
+                yield connection
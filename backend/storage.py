@@ -0,0 +1,146 @@
+import json
+import os
+import sqlite3
+import uuid
+from abc import ABC, abstractmethod
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+
+import mirror
+from sqlitedb import Database
+
+STORAGE_PATH = os.getenv('STORAGE_PATH', 'storage.db')
+STORAGE_TOKEN = os.getenv('STORAGE_TOKEN', '')  # Bearer the local backend accepts
+LOCAL_LINK = "local://"  # Scheme of the `next` links handed out by LocalStorage
+DEFAULT_PAGE_SIZE = 25
+
+
+class Storage(ABC):
+    """
+    Record storage behind db.get/db.post/db.patch.
+
+    Implementations take NOCO_DB_ENDPOINTS / NOCO_DB_TABLES keys and answer
+    with requests.Response objects shaped like NocoDB's: v3 listings
+    ({"records": [{"id", "fields"}], "next"}), {"count"} for COUNT, v1 flat
+    records for GENERIC/BULK posts and v3 {"id", "fields"} lists for patches.
+    """
+
+    @abstractmethod
+    def get(self, ep: str, bearer=None, table="", record="", query_params=None) -> requests.Response:
+        ...
+
+    @abstractmethod
+    def post(self, endpoint: str, bearer=None, table="", data=None) -> requests.Response:
+        ...
+
+    @abstractmethod
+    def patch(self, ep: str, bearer=None, table="", record="", data=None) -> requests.Response:
+        ...
+
+
+def make_response(status: int, body, url: str = "") -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps(body).encode('utf-8')
+    response.headers['Content-Type'] = 'application/json'
+    response.encoding = 'utf-8'
+    response.url = url
+    return response
+
+
+class LocalStorage(Storage):
+    """
+    Embedded storage in a single SQLite file, for single-node deployments,
+    benchmarks and runs that should not depend on a NocoDB server.
+
+    Records are kept as JSON per (table, key) like the mirror, and where
+    clauses are understood to the same extent (see mirror.iter_records).
+    Requests must carry STORAGE_TOKEN as their bearer.
+    """
+
+    def __init__(self, path: str = STORAGE_PATH, token: str = STORAGE_TOKEN):
+        self.token = token
+        self.database = Database(path, ["""
+            CREATE TABLE IF NOT EXISTS records (
+                tbl TEXT NOT NULL,
+                id TEXT NOT NULL,
+                fields TEXT NOT NULL,
+                PRIMARY KEY (tbl, id)
+            )
+        """])
+        self.database.connect()
+
+    def execute(self, sql: str, params=()) -> list:
+        return self.database.execute(sql, params)
+
+    def get(self, ep, bearer=None, table="", record="", query_params=None):
+        if bearer != self.token:
+            return make_response(401, {"msg": "Unauthorized"})
+        if ep.startswith(LOCAL_LINK):
+            link = urlsplit(ep)
+            ep, table, query_params = "RECORDS", link.netloc, dict(parse_qsl(link.query))
+        query_params = query_params or {}
+        try:
+            condition, params = mirror.where_sql(table, query_params.get('where'))
+        except ValueError as e:
+            return make_response(422, {"msg": str(e)})
+        if ep == "COUNT":
+            rows = self.execute(f"SELECT COUNT(*) FROM records WHERE tbl = ? AND ({condition})", (table, *params))
+            return make_response(200, {"count": rows[0][0]})
+        fields = query_params['fields'].split(",") if query_params.get('fields') else None
+        if record:
+            rows = self.execute("SELECT id, fields FROM records WHERE tbl = ? AND id = ?", (table, str(record)))
+            if not rows:
+                return make_response(404, {"msg": f"Record {record} not found"})
+            return make_response(200, self._record(*rows[0], fields))
+        page = int(query_params.get('page', 1))
+        size = int(query_params.get('pageSize', DEFAULT_PAGE_SIZE))
+        rows = self.execute(
+            f"SELECT id, fields FROM records WHERE tbl = ? AND ({condition}) ORDER BY rowid LIMIT ? OFFSET ?",
+            (table, *params, size, (page - 1) * size)
+        )
+        next_link = None
+        if len(rows) == size:
+            next_link = f"{LOCAL_LINK}{table}?{urlencode({**query_params, 'page': page + 1, 'pageSize': size})}"
+        return make_response(200, {"records": [self._record(*row, fields) for row in rows], "next": next_link})
+
+    def post(self, endpoint, bearer=None, table="", data=None):
+        if bearer != self.token:
+            return make_response(401, {"msg": "Unauthorized"})
+        key_field = mirror.KEY_FIELDS.get(table, "Id")
+        records = []
+        for item in data if isinstance(data, list) else [data]:
+            fields = mirror.text_fields(item.get("fields", item) if endpoint == "RECORDS" else item)
+            key = str(fields.get(key_field) or uuid.uuid4().hex)
+            records.append((table, key, json.dumps({**fields, key_field: fields.get(key_field, key)})))
+        # Like NocoDB, a batch with a duplicate key is rejected as a whole
+        try:
+            with self.database.transaction() as connection:
+                connection.executemany("INSERT INTO records (tbl, id, fields) VALUES (?, ?, ?)", records)
+        except sqlite3.IntegrityError as e:
+            return make_response(400, {"msg": f"Duplicate record: {e}"})
+        ids = [{"id": key} for _, key, _ in records]
+        return make_response(200, ids if isinstance(data, list) else ids[0])
+
+    def patch(self, ep, bearer=None, table="", record="", data=None):
+        if bearer != self.token:
+            return make_response(401, {"msg": "Unauthorized"})
+        updates = []
+        for item in data if isinstance(data, list) else [data]:
+            rows = self.execute("SELECT fields FROM records WHERE tbl = ? AND id = ?", (table, str(item["id"])))
+            if not rows:
+                return make_response(404, {"msg": f"Record {item['id']} not found"})
+            fields = {**json.loads(rows[0][0]), **mirror.text_fields(item.get("fields", {}))}
+            updates.append((json.dumps(fields), table, str(item["id"])))
+        self.database.executemany("UPDATE records SET fields = ? WHERE tbl = ? AND id = ?", updates)
+        return make_response(200, [{"id": item["id"]} for item in (data if isinstance(data, list) else [data])])
+
+    @staticmethod
+    def _record(record_id: str, fields: str, only: Optional[list] = None) -> dict:
+        fields = json.loads(fields)
+        fields.pop("Id", None)
+        if only:
+            fields = {name: value for name, value in fields.items() if name in only}
+        return {"id": record_id, "fields": fields}
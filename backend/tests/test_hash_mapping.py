@@ -0,0 +1,168 @@
+"""
+Checks that the hash mapping helpers give the same results as the
+implementations they replaced, kept below as the reference.
+
+fixtures/mapped_mods.json holds synthetic mods, generated in the shape the
+game and INI tables store them in (Data of the mod, INI records of its
+files), with INIs whose hashes change across versions so there are chains
+to map.
+"""
+import copy
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+import service
+from service import VERSIONS, VERSION_TIME
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+
+def reference_get_file_version(file_added: int) -> float:
+    file_version = file_added
+    for i in range(len(VERSION_TIME)):
+        if file_added >= VERSION_TIME[i]:
+            file_version = VERSIONS[i]
+    return file_version
+
+
+def reference_group_files_by_version(files: list) -> dict:
+    files_grouped_by_version = {}
+    for file in files:
+        files_grouped_by_version.setdefault(reference_get_file_version(file.get("added", 0)), []).append(file)
+    return files_grouped_by_version
+
+
+def reference_merge_version_inis(version_inis: list) -> dict:
+    merged_data = {}
+    for file in version_inis:
+        for i, ini in enumerate(file["inis"]):
+            exists = [k for k in merged_data.keys() if k.startswith(ini["name"])]
+            key = ini["name"]
+            if i != 0 and exists:
+                key += f'_{i}'
+            if not exists or key not in merged_data:
+                merged_data[key] = ini["data"]
+            elif ini["data"] != merged_data[exists[0]]:
+                merged_data[key].update(ini["data"])
+    return merged_data
+
+
+def reference_build_next_candidates(hash_list: list, current_obj: dict) -> dict:
+    candidates = [x for x in hash_list if x["ver"] >= current_obj["ver"] and x["hash"] != current_obj["hash"]]
+    next_versions = {}
+    for candidate in candidates:
+        counts = next_versions.setdefault(candidate["ver"], {})
+        counts[candidate["hash"]] = counts.get(candidate["hash"], 0) + 1
+    return next_versions
+
+
+def reference_process_hash_mappings(inis_grouped_by_name: dict, mod_id: str) -> dict:
+    hashes = {}
+    for file, data in inis_grouped_by_name.items():
+        keys = {}
+        for ver, ini in data.items():
+            for key, hash_val in ini.items():
+                keys.setdefault(key, {})
+                if hash_val not in keys[key]:
+                    keys[key][hash_val] = ver
+        for key, hash_versions in keys.items():
+            if len(hash_versions) < 2:
+                continue
+            hash_list = [{"hash": k, "ver": v} for k, v in hash_versions.items()]
+            hash_list.sort(key=lambda x: float(x["ver"]))
+            for hash_obj in hash_list:
+                next_data = reference_build_next_candidates(hash_list, hash_obj)
+                service._merge_hash_data(hashes, hash_obj["hash"], hash_obj["ver"], next_data, mod_id)
+    return hashes
+
+
+def reference_analyze(mod_id: str, files: list, ini_texts: dict) -> dict:
+    inis = {
+        ini_id: {"name": ini["name"], "data": service.parse_ini_by_hash(ini["content"])}
+        for ini_id, ini in ini_texts.items()
+    }
+    inis_grouped_by_version = {
+        version: reference_merge_version_inis(service._collect_version_inis(version_files, inis))
+        for version, version_files in reference_group_files_by_version(files).items()
+    }
+    inis_grouped_by_name = service._group_inis_by_name(inis_grouped_by_version)
+    return service._flatten_hash_data(reference_process_hash_mappings(inis_grouped_by_name, mod_id))
+
+
+def load_mods() -> list:
+    with open(FIXTURES / "mapped_mods.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def ini_texts(record: dict) -> dict:
+    """{ini id: {"name", "hash", "content"}} of a fixture mod, as _fetch_ini_texts returns them."""
+    prefix = f"WW/{record['Id']}/"
+    return {
+        ini["Id"].replace(prefix, ""): {"name": ini["Name"], "hash": service.ini_hash(ini["Data"]), "content": ini["Data"]}
+        for ini in record["inis"]
+    }
+
+
+@pytest.mark.parametrize("record", load_mods(), ids=lambda record: record["Id"])
+def test_fixture_mods_map_as_before(record):
+    files = service._parse_mod_data({"id": record["Id"], "data": record["Data"]})
+    texts = ini_texts(record)
+    expected = reference_analyze(record["Id"], copy.deepcopy(files), copy.deepcopy(texts))
+    groups = service._group_files_by_version(copy.deepcopy(files))
+    assert groups == reference_group_files_by_version(copy.deepcopy(files))
+    hashes = service._analyze_inis(record["Id"], groups, texts)
+    # Key order is compared too, it is the order records are written in
+    assert json.dumps(hashes) == json.dumps(expected)
+
+
+def test_fixture_mods_map_hash_chains():
+    # The fixtures must exercise version chains, not only mods with nothing to map
+    records = load_mods()
+    mapped = 0
+    for record in records:
+        groups = service._group_files_by_version(service._parse_mod_data({"id": record["Id"], "data": record["Data"]}))
+        if len(groups) > 1 and service._analyze_inis(record["Id"], groups, ini_texts(record)):
+            mapped += 1
+    assert mapped >= len(records) // 2
+
+
+def test_file_version_matches_linear_scan():
+    rnd = random.Random(7)
+    timestamps = [0, 1, VERSION_TIME[0] - 1, 2 * 10**9] + VERSION_TIME + [t + 1 for t in VERSION_TIME]
+    timestamps += [rnd.randint(VERSION_TIME[0] - 10**7, VERSION_TIME[-1] + 10**7) for _ in range(5000)]
+    for timestamp in timestamps:
+        assert service._get_file_version(timestamp) == reference_get_file_version(timestamp)
+
+
+def test_merge_version_inis_matches_prefix_scan():
+    rnd = random.Random(7)
+    names = ["a.ini", "a", "ab.ini", "a.ini_1", "b", "merged.ini", "merged"]
+    for _ in range(2000):
+        version_inis = [{
+            "file_id": file_id,
+            "inis": [{
+                "name": rnd.choice(names),
+                "data": {f"k{rnd.randint(0, 4)}": rnd.choice("xyz") for _ in range(rnd.randint(0, 3))}
+            } for _ in range(rnd.randint(0, 4))]
+        } for file_id in range(rnd.randint(0, 4))]
+        merged = service._merge_version_inis(copy.deepcopy(version_inis))
+        expected = reference_merge_version_inis(copy.deepcopy(version_inis))
+        assert merged == expected and list(merged) == list(expected)
+
+
+def test_process_hash_mappings_matches_candidate_scan():
+    rnd = random.Random(7)
+    versions = ["1.1", "1.2", "1.3", "2.0", "2.7", "1700000000", "0"]
+    for _ in range(1000):
+        inis_grouped_by_name = {
+            f"f{file}.ini": {
+                ver: {f"K{rnd.randint(0, 5)}": f"{rnd.randint(0, 12):x}" for _ in range(rnd.randint(0, 6))}
+                for ver in rnd.sample(versions, rnd.randint(1, 5))
+            } for file in range(rnd.randint(1, 3))
+        }
+        hashes = service._process_hash_mappings(copy.deepcopy(inis_grouped_by_name), "Mod/1")
+        expected = reference_process_hash_mappings(copy.deepcopy(inis_grouped_by_name), "Mod/1")
+        assert json.dumps(hashes) == json.dumps(expected)
@@ -0,0 +1,20 @@
+"""Checks that where clauses are translated into SQL the records index can serve."""
+import mirror
+from sqlitedb import Database
+
+
+def test_key_prefix_reads_an_index_range(tmp_path):
+    database = Database(str(tmp_path / "mirror.db"), mirror.database.schema)
+    ids = ["WW/Mod/1/a.ini", "WW/Mod/1/b.ini", "WW/Mod/10/a.ini", "WW/Mod/2/a.ini", "WW/Mod/1"]
+    database.executemany("INSERT INTO records (tbl, id, fields) VALUES ('INI', ?, '{}')", [(record_id,) for record_id in ids])
+    condition, params = mirror.where_sql("INI", "(Id, like, WW/Mod/1/%)")
+    sql = f"SELECT id FROM records WHERE tbl = ? AND ({condition}) ORDER BY id"
+    assert [record_id for (record_id,) in database.execute(sql, ("INI", *params))] == ["WW/Mod/1/a.ini", "WW/Mod/1/b.ini"]
+    plan = " ".join(row[-1] for row in database.execute(f"EXPLAIN QUERY PLAN {sql}", ("INI", *params)))
+    assert "id>? AND id<?" in plan
+    database.connection.close()
+
+
+def test_like_without_wildcards_matches_anywhere():
+    assert mirror.where_sql("WW", "(Id, like, Mod/1/)") == ("id LIKE ?", ["%Mod/1/%"])
+    assert mirror.where_sql("INI", "(Id, like, WW/Mod_1/%)") == ("id LIKE ?", ["WW/Mod_1/%"])
@@ -0,0 +1,62 @@
+"""Checks how drain_once groups queued writes into requests."""
+import time
+
+import pytest
+import requests
+
+import db
+import outbox
+from sqlitedb import Database
+
+
+@pytest.fixture
+def sent(monkeypatch, tmp_path):
+    calls = []
+
+    def answer(method):
+        def call(endpoint, bearer=None, table="", data=None, **kwargs):
+            calls.append((method, endpoint, table, data))
+            response = requests.Response()
+            response.status_code = 200
+            return response
+        return call
+
+    database = Database(str(tmp_path / "outbox.db"), outbox.database.schema)
+    monkeypatch.setattr(outbox, "database", database)
+    monkeypatch.setattr(outbox, "get_bearer", lambda: "token")
+    monkeypatch.setattr(outbox, "FLUSH_INTERVAL", 0)
+    monkeypatch.setattr(db, "NOCO_DB_ENDPOINTS", {**db.NOCO_DB_ENDPOINTS, "BULK": "/bulk/{}/{}"})
+    monkeypatch.setattr(db, "post", answer("post"))
+    monkeypatch.setattr(db, "patch", answer("patch"))
+    yield calls
+    database.connection.close()
+
+
+def test_interleaved_tables_are_sent_in_bulk(sent):
+    # upload_ini queues the blob of an INI and then the INI itself
+    for i in range(20):
+        outbox.enqueue("post", "GENERIC", "INIB", {"Hash": f"h{i}"}, record=f"h{i}")
+        outbox.enqueue("post", "GENERIC", "INI", {"Id": f"WW/Mod/1/{i}"}, record=f"WW/Mod/1/{i}")
+    time.sleep(0.01)
+    assert outbox.drain_once() == 40
+    assert [(method, endpoint, table, len(data)) for method, endpoint, table, data in sent] == [
+        ("post", "BULK", "INIB", 20),
+        ("post", "BULK", "INI", 20),
+    ]
+    assert outbox.stats()["pending"] == 0
+
+
+def test_writes_to_one_record_keep_their_order(sent):
+    outbox.enqueue("patch", "RECORDS", "WW", [{"id": "Mod/1", "fields": {"Data": "a"}}], record="Mod/1")
+    outbox.enqueue("post", "GENERIC", "WW", {"Id": "Mod/2"}, record="Mod/2")
+    outbox.enqueue("patch", "RECORDS", "WW", [{"id": "Mod/3", "fields": {"Data": "b"}}], record="Mod/3")
+    # The post of Mod/2 must not be sent before this patch is merged with the first
+    outbox.enqueue("patch", "RECORDS", "WW", [{"id": "Mod/2", "fields": {"Data": "c"}}], record="Mod/2")
+    time.sleep(0.01)
+    outbox.drain_once()
+    assert [(method, [item.get("id", item.get("Id")) for item in (data if isinstance(data, list) else [data])])
+            for method, _, _, data in sent] == [
+        ("patch", ["Mod/1", "Mod/3"]),
+        ("post", ["Mod/2"]),
+        ("patch", ["Mod/2"]),
+    ]
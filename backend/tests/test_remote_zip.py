@@ -0,0 +1,121 @@
+"""
+Reads INIs out of a zip served by a local HTTP server with Range support and
+checks they match a local read while only the central directory and the INI
+members are fetched.
+"""
+import io
+import random
+import re
+import threading
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import service
+from remote_zip import HttpRangeFile, LOCAL_HEADER_SLACK, TAIL_SIZE
+
+RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+FILLER_SIZE = 1024 * 1024
+
+
+def build_zip() -> bytes:
+    rnd = random.Random(3)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for i in range(3):
+            ini = "\n".join(f"[TextureOverride{i}_{j}]\nhash = {rnd.getrandbits(32):08x}\n" for j in range(200))
+            archive.writestr(f"Mod{i}/merged.ini", ini, compress_type=zipfile.ZIP_DEFLATED)
+            # Incompressible members that must not be downloaded
+            archive.writestr(f"Mod{i}/texture.dds", rnd.randbytes(FILLER_SIZE), compress_type=zipfile.ZIP_STORED)
+    return buffer.getvalue()
+
+
+class ZipServer(ThreadingHTTPServer):
+    def __init__(self, body: bytes, ranges: bool = True):
+        super().__init__(("127.0.0.1", 0), ZipHandler)
+        self.body = body
+        self.ranges = ranges
+        self.served = []  # (start, end) of every range answered
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/mod.zip"
+
+
+class ZipHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = self.server.body
+        match = RANGE_PATTERN.match(self.headers.get("Range", ""))
+        if not self.server.ranges or not match:
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        first, last = match.groups()
+        if first:
+            start, end = int(first), min(len(body), int(last) + 1 if last else len(body))
+        else:
+            start, end = max(0, len(body) - int(last)), len(body)
+        self.server.served.append((start, end))
+        self.send_response(206)
+        self.send_header("Content-Range", f"bytes {start}-{end - 1}/{len(body)}")
+        self.send_header("Content-Length", str(end - start))
+        self.end_headers()
+        self.wfile.write(body[start:end])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(body: bytes, ranges: bool = True) -> ZipServer:
+        server = ZipServer(body, ranges)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_remote_inis_match_local_read(serve):
+    body = build_zip()
+    server = serve(body)
+    inis = service.read_remote_zip_inis(server.url)
+    assert inis is not None
+    assert inis == service.read_zip_inis(io.BytesIO(body))
+    assert len(inis) == 3
+
+
+def test_only_central_directory_and_ini_members_are_fetched(serve):
+    body = build_zip()
+    server = serve(body)
+    service.read_remote_zip_inis(server.url)
+    with zipfile.ZipFile(io.BytesIO(body)) as archive:
+        infos = archive.infolist()
+    fillers = [info for info in infos if info.filename.endswith(".dds")]
+    inis = [info for info in infos if info.filename.endswith(".ini")]
+    # No fetched range reaches into the data of a filler member, apart from
+    # the tail read that ends the archive
+    tail_start = len(body) - TAIL_SIZE
+    for info in fillers:
+        data_start = info.header_offset + 30 + len(info.orig_filename.encode("utf-8")) + LOCAL_HEADER_SLACK
+        data_end = min(info.header_offset + info.compress_size, tail_start)
+        for start, end in server.served:
+            assert end <= data_start or start >= data_end, (info.filename, start, end)
+    allowance = TAIL_SIZE + sum(info.compress_size + 30 + len(info.filename) + 2 * LOCAL_HEADER_SLACK for info in inis)
+    assert sum(end - start for start, end in server.served) <= allowance
+    assert sum(end - start for start, end in server.served) < len(body) // 10
+
+
+def test_server_without_ranges_is_not_used(serve):
+    server = serve(build_zip(), ranges=False)
+    assert HttpRangeFile.open(service.session, server.url) is None
+    assert service.read_remote_zip_inis(server.url) is None
@@ -0,0 +1,49 @@
+"""Checks that requests hold their rate limiter slot for as long as their body is being read."""
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import ratelimit
+import sessions
+
+
+class BodyHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = b"x" * 65536
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BodyHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    budget = ratelimit.HostBudget("test", rate=100.0, max_rate=100.0, concurrency=2, max_concurrency=2)
+    monkeypatch.setattr(ratelimit, "budget_for", lambda url: budget)
+    budget.url = f"http://127.0.0.1:{server.server_address[1]}/file"
+    yield budget
+    server.shutdown()
+    server.server_close()
+
+
+def test_plain_request_releases_its_slot(budget):
+    response = sessions.session.get(budget.url)
+    assert len(response.content) == 65536
+    assert budget.in_flight == 0
+
+
+def test_streamed_request_holds_its_slot_until_closed(budget):
+    with sessions.session.get(budget.url, stream=True) as response:
+        assert budget.in_flight == 1
+        assert sum(len(chunk) for chunk in response.iter_content(8192)) == 65536
+        assert budget.in_flight == 1
+    assert budget.in_flight == 0
+    # Closing again does not release a second slot
+    response.close()
+    assert budget.in_flight == 0